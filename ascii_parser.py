@@ -0,0 +1,217 @@
+"""
+Single-pass parser for IBA OmniPro / MyQA Accept ASCII exports.
+
+The file is memory-mapped and cut into measurement blocks at each
+``# Measurement number`` line by byte offset, and the ``=`` data rows of a
+block are converted to a NumPy array in one call instead of being tokenized
+line by line. MappedAsciiFile parses block data only on request, so the whole
+file is never held in memory as text.
+"""
+
+import mmap
+import re
+import warnings
+
+import numpy as np
+
+# Measurement block start, e.g. "# Measurement number \t1"
+_BLOCK_BYTES_RE = re.compile(rb'^#[ \t]*Measurement number[ \t]*([^\r\n]*)', re.MULTILINE)
+
+# Anything but whitespace
+_CONTENT_RE = re.compile(rb'\S')
+
+# Same tokenizer as the original parser, only applied to the few header lines
+_TOKEN_RE = re.compile('\t|#')
+
+
+def _header_tokens(line):
+    """Split a header line into its non-empty tokens."""
+    return [token for token in _TOKEN_RE.split(line) if token]
+
+
+def _parse_data_rows(data_text):
+    """Convert a run of '= x y z dose' lines into an (N, 4) float64 array."""
+    if not data_text:
+        return np.empty((0, 4))
+
+    first_line = data_text.split('\n', 1)[0]
+    num_columns = len(first_line.split()) - 1
+    num_rows = data_text.count('\n=') + 1
+
+    try:
+        with warnings.catch_warnings():
+            # numpy reports trailing garbage as a DeprecationWarning
+            warnings.simplefilter('error', DeprecationWarning)
+            values = np.fromstring(data_text.replace('=', ' '), sep=' ')
+    except (ValueError, DeprecationWarning):
+        values = None
+
+    if values is None or num_columns < 4 or values.size != num_rows * num_columns:
+        # Irregular block (comments between rows, ragged columns): fall back to
+        # reading only the '=' lines so bad rows are reported with context.
+        rows = [line[1:] for line in data_text.split('\n') if line.startswith('=')]
+        try:
+            values = np.loadtxt(rows, ndmin=2)
+        except ValueError as e:
+            raise Exception(f"Invalid data row: {str(e)}")
+        if values.shape[1] < 4:
+            raise Exception("Data rows must contain x, y, z and dose columns")
+        return np.ascontiguousarray(values[:, :4], dtype=np.float64)
+
+    return np.ascontiguousarray(values.reshape(num_rows, num_columns)[:, :4])
+
+
+def _parse_header(header_text, fields):
+    """Parse the header lines of one measurement block.
+
+    ``fields`` holds the header values of the previous block; tags missing from
+    this block keep their previous value, as in the original parser.
+    Returns the 13-field header list.
+    """
+    for line in header_text.split('\n'):
+        if not line.startswith('%'):
+            continue
+        tokens = _header_tokens(line)
+        tag = tokens[0]
+
+        if tag == '%SCN':
+            fields['measurement_type'] = tokens[1]
+        elif tag == '%DAT':
+            fields['measurement_date'] = tokens[1]
+        elif tag == '%TIM':
+            fields['measurement_time'] = tokens[1]
+        elif tag == '%FSZ':
+            fields['field_size_x'] = float(tokens[1])
+            fields['field_size_y'] = float(tokens[2])
+        elif tag == '%BMT':
+            fields['beam_type'] = tokens[1]
+            fields['beam_energy'] = float(tokens[2])
+        elif tag == '%SSD':
+            fields['ssd'] = float(tokens[1])
+        elif tag == '%STS':
+            fields['start_x'] = float(tokens[1])
+            fields['start_y'] = float(tokens[2])
+            fields['start_z'] = float(tokens[3])
+        elif tag == '%EDS':
+            fields['stop_z'] = float(tokens[3])
+
+    return [
+        fields['measurement_number'], fields['measurement_date'],
+        fields['measurement_time'], fields['measurement_type'],
+        fields['beam_type'], fields['beam_energy'], fields['field_size_x'],
+        fields['field_size_y'], fields['ssd'], fields['start_x'],
+        fields['start_y'], fields['start_z'], fields['stop_z']
+    ]
+
+
+def _decode(data):
+    """Text of a byte range, with Windows line endings normalised."""
+    return data.decode('utf-8', errors='replace').replace('\r', '')
+
+
+class MappedAsciiFile:
+    """An IBA ASCII file indexed by byte offset, with scans parsed on demand.
+
+    Opening the file memory-maps it and reads only the header lines of every
+    measurement block; ``headers`` lists them (same 13 fields as
+    parse_ascii_file) in file order. read_scan(i) parses the data rows of
+    block i when asked, so memory use scales with the largest scan rather than
+    the file. Blocks without an end-of-measurement marker are skipped.
+
+        with MappedAsciiFile(path) as export:
+            points = export.read_scan(0)
+    """
+
+    def __init__(self, filepath):
+        try:
+            self._file = open(filepath, 'rb')
+        except Exception as e:
+            raise Exception(f"Failed to read file: {str(e)}")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()  # mmap refuses empty files
+            raise Exception("No data found in file")
+        except Exception as e:
+            self._file.close()
+            raise Exception(f"Failed to read file: {str(e)}")
+
+        self.headers = []
+        self.blocks = []  # (data start, data end) byte offsets per scan
+        try:
+            self._index()
+        except Exception:
+            self.close()
+            raise
+
+        if not self.headers and not _CONTENT_RE.search(self._map):
+            self.close()
+            raise Exception("No data found in file")
+
+    def _index(self):
+        """Find every block and parse its header lines."""
+        fields = dict.fromkeys([
+            'measurement_number', 'measurement_date', 'measurement_time',
+            'measurement_type', 'beam_type', 'beam_energy', 'field_size_x',
+            'field_size_y', 'ssd', 'start_x', 'start_y', 'start_z', 'stop_z'
+        ])
+        data = self._map
+        starts = _BLOCK_BYTES_RE.finditer(data)
+        following = next(starts, None)
+        while following is not None:
+            match, following = following, next(starts, None)
+            end = following.start() if following is not None else len(data)
+            fields['measurement_number'] = float(match.group(1).strip())
+
+            eom = data.find(b'\n:EOM', match.end(), end)
+            if eom < 0:
+                continue
+            data_start = data.find(b'\n=', match.end(), eom)
+            header_end = eom if data_start < 0 else data_start
+
+            self.headers.append(_parse_header(_decode(data[match.end():header_end]), fields))
+            self.blocks.append((header_end + 1 if data_start >= 0 else eom, eom))
+
+    def __len__(self):
+        return len(self.headers)
+
+    def read_scan(self, i):
+        """Parse the data rows of block ``i`` into an (N, 4) float64 array."""
+        start, end = self.blocks[i]
+        return _parse_data_rows(_decode(self._map[start:end]).rstrip())
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_block_scan(filepath, block):
+    """Parse the data rows of one block, given its (start, end) byte offsets.
+
+    Reads only that byte range, for callers that keep MappedAsciiFile.blocks
+    but not the open file.
+    """
+    start, end = block
+    with open(filepath, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return _parse_data_rows(_decode(data).rstrip())
+
+
+def parse_ascii_file(filepath):
+    """Parse an IBA ASCII file.
+
+    Returns (headers, scans) where headers is a list of 13-field header lists
+    [number, date, time, scan type, beam type, energy, field size x,
+    field size y, SSD, start x, start y, start z, stop z] and scans is a list of
+    matching (N, 4) float64 arrays of x, y, z and dose.
+    """
+    with MappedAsciiFile(filepath) as export:
+        scans = [export.read_scan(i) for i in range(len(export))]
+        return export.headers, scans
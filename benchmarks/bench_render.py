@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Per-page report render time: reusable ReportTemplate vs building every page
+from scratch (report.render_page_fresh).
+
+Usage:
+    python benchmarks/bench_render.py [--pages 30]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+from matplotlib.backends.backend_pdf import PdfPages
+
+import engine
+import report
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def load_results():
+    reference = engine.load_scans(os.path.join(DATA_DIR, "test_data_reference.txt"))
+    measurement = engine.load_scans(os.path.join(DATA_DIR, "test_data_measurement.txt"))
+    matches = engine.match_scans(measurement, reference)
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    results, _ = engine.compute_gamma_batch(measurement, reference, matches, config)
+    return [results[tuple(match)] for match in matches]
+
+
+def time_pages(render, results, pages, pdf_path):
+    """Seconds per page for rendering ``pages`` pages into one PDF."""
+    with PdfPages(pdf_path) as pdf_pages:
+        start = time.perf_counter()
+        for i in range(pages):
+            render(results[i % len(results)], pdf_pages)
+        elapsed = time.perf_counter() - start
+    return elapsed / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--out', default='.',
+                        help="Directory for the benchmark PDFs (default: current)")
+    args = parser.parse_args()
+
+    results = load_results()
+    template = report.ReportTemplate(engine.DEFAULT_GAMMA_CONFIG)
+
+    fresh = time_pages(lambda result, pdf_pages: report.render_page_fresh(result, pdf_pages),
+                       results, args.pages, os.path.join(args.out, "bench_fresh.pdf"))
+    reused = time_pages(template.render, results, args.pages,
+                        os.path.join(args.out, "bench_template.pdf"))
+
+    print(f"\n{'='*60}")
+    print(f"Report rendering, {args.pages} pages")
+    print(f"{'='*60}")
+    print(f"  Fresh figure per page: {fresh*1000:8.1f} ms/page")
+    print(f"  Reused template:       {reused*1000:8.1f} ms/page")
+    print(f"  Speed-up:              {fresh/reused:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Parse, match, gamma and render throughput on synthetic scan libraries.
+
+Generates a reference and a measurement library (benchmarks/synthetic.py),
+times each stage of the pipeline on them and appends the throughputs to a
+results file (one JSON record per run). With --check the run fails when any
+throughput dropped by more than --tolerance against the previous run with
+the same settings on the same machine.
+
+Usage:
+    python benchmarks/bench_suite.py [--scans 2000] [--gamma-pairs 500] [--pages 20]
+    python benchmarks/bench_suite.py --check
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import numpy as np
+
+import engine
+from matching import find_matches
+from scan_store import ScanCatalog, load_scan_set
+from synthetic import write_library
+
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, 'results.jsonl')
+
+
+def best_time(function, repeat):
+    """Shortest of ``repeat`` wall times of ``function()``, and its last return value."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def run_benchmarks(workdir, scans=2000, gamma_pairs=500, pages=20, pymedphys_pairs=0,
+                   repeat=3):
+    """Time every stage; returns {metric: throughput}, higher is better."""
+    reference_path = os.path.join(workdir, 'reference.txt')
+    measurement_path = os.path.join(workdir, 'measurement.txt')
+    print(f"Generating {scans} synthetic scans per library...")
+    points = write_library(reference_path, scans)
+    write_library(measurement_path, scans, variation=0.003, date="01-15-2025")
+    megabytes = os.path.getsize(reference_path) / 2 ** 20
+
+    metrics = {}
+    elapsed, reference = best_time(lambda: load_scan_set(reference_path), repeat)
+    metrics['parse_scans_per_s'] = scans / elapsed
+    metrics['parse_points_per_s'] = points / elapsed
+    metrics['parse_mb_per_s'] = megabytes / elapsed
+
+    elapsed, _ = best_time(lambda: ScanCatalog(reference_path), repeat)
+    metrics['index_scans_per_s'] = scans / elapsed
+
+    measurement = load_scan_set(measurement_path)
+    elapsed, (matches, _) = best_time(
+        lambda: find_matches(measurement.headers, reference.headers), repeat)
+    metrics['match_scans_per_s'] = scans / elapsed
+
+    # Gamma and rendering only apply to profiles, not depth doses
+    profile_matches = [match for match in matches
+                       if reference.index[match[1]][0].scan_type == 'PRO']
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    selected = profile_matches[:gamma_pairs]
+    elapsed, (results, errors) = best_time(
+        lambda: engine.compute_gamma_batch(measurement, reference, selected, config), repeat)
+    if errors:
+        raise Exception(f"{len(errors)} synthetic pairs failed: {next(iter(errors.values()))}")
+    metrics['gamma_numpy_pairs_per_s'] = len(selected) / elapsed
+
+    if pymedphys_pairs:
+        subset = profile_matches[:pymedphys_pairs]
+        pymedphys_config = dict(config, gamma_engine='pymedphys')
+        elapsed, _ = best_time(lambda: engine.compute_gamma_batch(
+            measurement, reference, subset, pymedphys_config), 1)
+        metrics['gamma_pymedphys_pairs_per_s'] = len(subset) / elapsed
+
+    page_results = list(results.values())[:pages]
+    engine._render_page(page_results[0], config)  # template layout and font loading
+    start = time.perf_counter()
+    for result in page_results:
+        engine._render_page(result, config)
+    metrics['render_pages_per_s'] = len(page_results) / (time.perf_counter() - start)
+    return metrics
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def previous_run(results_path, settings):
+    """Last recorded run with the same settings on this machine, or None."""
+    if not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('settings') == settings and record.get('machine') == platform.node():
+                previous = record
+    return previous
+
+
+def regressions(metrics, previous, tolerance):
+    """(metric, previous, current) of every throughput below (1 - tolerance) x previous."""
+    return [(name, previous['metrics'][name], value) for name, value in metrics.items()
+            if name in previous['metrics'] and value < previous['metrics'][name] * (1 - tolerance)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scans', type=int, default=2000)
+    parser.add_argument('--gamma-pairs', type=int, default=500)
+    parser.add_argument('--pymedphys-pairs', type=int, default=0,
+                        help="Also time this many pairs with pymedphys (slow)")
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--results', default=DEFAULT_RESULTS,
+                        help="JSON-lines file the run is appended to (default: %(default)s)")
+    parser.add_argument('--check', action='store_true',
+                        help="Exit 1 when a throughput regressed against the previous run")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed throughput drop for --check (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    settings = {'scans': args.scans, 'gamma_pairs': args.gamma_pairs,
+                'pymedphys_pairs': args.pymedphys_pairs, 'pages': args.pages}
+    with tempfile.TemporaryDirectory() as workdir:
+        metrics = run_benchmarks(workdir, args.scans, args.gamma_pairs, args.pages,
+                                 args.pymedphys_pairs, args.repeat)
+
+    previous = previous_run(args.results, settings)
+    record = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'settings': settings,
+        'metrics': metrics,
+    }
+    with open(args.results, 'a') as file:
+        file.write(json.dumps(record) + '\n')
+
+    print(f"\n{'='*60}")
+    print(f"Benchmarks, {args.scans} scans ({record['commit'] or 'unknown commit'})")
+    print(f"{'='*60}")
+    for name, value in metrics.items():
+        change = ''
+        if previous is not None and name in previous['metrics']:
+            change = f"  ({value / previous['metrics'][name] - 1:+.0%} vs {previous['commit']})"
+        print(f"  {name:<28} {value:12.1f}{change}")
+    print(f"Results appended to {args.results}")
+
+    if args.check and previous is not None:
+        slower = regressions(metrics, previous, args.tolerance)
+        for name, before, after in slower:
+            print(f"  ✗ {name} regressed: {before:.1f} -> {after:.1f}")
+        if slower:
+            return 1
+        print(f"  ✓ No throughput dropped by more than {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Synthetic IBA ASCII scan libraries for benchmarks.
+
+Every scan has its own (beam, energy, field size, direction, depth)
+combination, so a measurement library written from the same seed matches a
+reference library one to one. Libraries mix photon and electron beams,
+x and y profiles at 0.5-5 mm resolution and depth dose (PDD) curves.
+
+Usage:
+    python benchmarks/synthetic.py reference.txt --scans 2000
+    python benchmarks/synthetic.py measurement.txt --scans 2000 --variation 0.005
+"""
+
+import argparse
+import math
+
+import numpy as np
+
+BEAMS = [('PHO', energy) for energy in (4.0, 6.0, 10.0, 15.0, 18.0)] + \
+        [('ELE', energy) for energy in (6.0, 9.0, 12.0, 15.0, 18.0, 20.0)]
+FIELD_SIZES = (20.0, 30.0, 50.0, 100.0, 150.0, 200.0, 300.0, 400.0)
+# Profile depths 20 mm apart, twice the matching depth tolerance
+DEPTHS = tuple(float(depth) for depth in range(10, 400, 20))
+RESOLUTIONS = (0.5, 1.0, 2.0, 5.0)
+SSD = 1000.0
+PDD_RANGE = 300.0
+
+
+def scan_plan(num_scans, seed=0):
+    """(beam type, energy, field size, scan axis, depth, resolution) of every scan.
+
+    The scan axis is 'x', 'y' or 'z' (a depth dose). Raises when more scans
+    are asked for than there are distinct combinations.
+    """
+    combinations = [(beam, energy, field, axis, depth)
+                    for beam, energy in BEAMS for field in FIELD_SIZES
+                    for axis in ('x', 'y') for depth in DEPTHS]
+    combinations += [(beam, energy, field, 'z', 0.0)
+                     for beam, energy in BEAMS for field in FIELD_SIZES]
+    if num_scans > len(combinations):
+        raise Exception(f"At most {len(combinations)} distinct synthetic scans "
+                        f"(asked for {num_scans})")
+
+    rng = np.random.default_rng(seed)
+    chosen = rng.permutation(len(combinations))[:num_scans]
+    resolutions = rng.choice(RESOLUTIONS, size=num_scans)
+    return [combinations[i] + (float(resolution),)
+            for i, resolution in zip(chosen, resolutions)]
+
+
+def profile_dose(position, field_size, depth):
+    """Flat field with sigmoid penumbrae widening with depth, 1.0 on the axis."""
+    half_width = field_size / 2 * (SSD + depth) / SSD
+    sigma = 2.0 + depth / 100
+    field = 0.5 * (np.tanh((half_width - position) / sigma) +
+                   np.tanh((half_width + position) / sigma))
+    dose = 0.98 * field + 0.02 * np.exp(-np.abs(position) / 200)  # scatter tail
+    return dose / (0.98 * math.tanh(half_width / sigma) + 0.02)
+
+
+def depth_dose(depth, energy):
+    """Build-up to a maximum at 2.5 mm per MeV/MV, then exponential fall-off."""
+    d_max = 2.5 * energy
+    build_up = 1 - np.exp(-5 * depth / d_max)
+    return build_up * np.exp(-0.004 * np.maximum(depth - d_max, 0))
+
+
+def scan_points(beam, energy, field, axis, depth, resolution, rng, variation):
+    """(N, 4) x, y, z, dose points of one scan."""
+    if axis == 'z':
+        z = np.arange(0.0, PDD_RANGE + resolution / 2, resolution)
+        x = y = np.zeros_like(z)
+        dose = depth_dose(z, energy)
+    else:
+        extent = field / 2 * (SSD + depth) / SSD + 50
+        steps = math.ceil(extent / resolution)
+        position = np.arange(-steps, steps + 1) * resolution  # always samples the axis
+        zeros = np.zeros_like(position)
+        x, y = (position, zeros) if axis == 'x' else (zeros, position)
+        z = np.full_like(position, depth)
+        dose = profile_dose(position, field, depth)
+
+    if variation:
+        dose = dose * (1 + rng.normal(0, variation, size=len(dose)))
+    return np.column_stack([x, y, z, dose])
+
+
+def _block(number, beam, energy, field, axis, points, date, minutes):
+    start, stop = points[0], points[-1]
+    header = [
+        f"# Measurement number \t{number}",
+        "%VNR\t1.0", "%MOD\tRAD", "%TYP\tSCN",
+        f"%SCN\t{'DPT' if axis == 'z' else 'PRO'}",
+        "%FLD\tRAD",
+        f"%DAT\t{date}",
+        f"%TIM\t{minutes // 60 % 24:02d}:{minutes % 60:02d}:00",
+        f"%FSZ\t{field:.3f}\t{field:.3f}",
+        f"%BMT\t{beam}\t{energy:.1f}",
+        f"%SSD\t{SSD:.3f}",
+        "%BUP\t100.00", "%BRD\t50.00", "%FMT\t1",
+        f"%STS\t{start[0]:.3f}\t{start[1]:.3f}\t{start[2]:.3f}",
+        f"%EDS\t{stop[0]:.3f}\t{stop[1]:.3f}\t{stop[2]:.3f}",
+        f"%PTS\t{len(points)}",
+    ]
+    rows = [f"=\t{x:.3f}\t{y:.3f}\t{z:.3f}\t{dose:.4f}" for x, y, z, dose in points]
+    return "\n".join(header + rows) + "\n:EOM  # End of Measurement\n"
+
+
+def write_library(path, num_scans, seed=0, variation=0.0, date="01-15-2024"):
+    """Write ``num_scans`` synthetic scans to ``path``; returns the number of points.
+
+    Libraries written with the same ``num_scans`` and ``seed`` hold the same
+    scans in the same order; ``variation`` adds relative Gaussian dose noise
+    (e.g. 0.005 for 0.5%), seeded separately per ``date``.
+    """
+    rng = np.random.default_rng([seed, sum(map(ord, date))])
+    total = 0
+    with open(path, 'w') as file:
+        file.write(f"# Number of measurements:\t{num_scans}\n\n")
+        for number, (beam, energy, field, axis, depth, resolution) in enumerate(
+                scan_plan(num_scans, seed), start=1):
+            points = scan_points(beam, energy, field, axis, depth, resolution, rng, variation)
+            file.write(_block(number, beam, energy, field, axis, points, date, 600 + number))
+            file.write("\n")
+            total += len(points)
+        file.write(":EOF  # End of File\n")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--scans', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--variation', type=float, default=0.0,
+                        help="Relative dose noise, e.g. 0.005 (default: %(default)s)")
+    parser.add_argument('--date', default="01-15-2024")
+    args = parser.parse_args()
+
+    points = write_library(args.path, args.scans, args.seed, args.variation, args.date)
+    print(f"✓ Wrote {args.scans} scans ({points} points) to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
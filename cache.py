@@ -0,0 +1,152 @@
+"""
+Content-addressed on-disk cache of gamma results.
+
+Entries are keyed by a SHA-256 of both scans (header and point arrays) and
+the gamma configuration, so a pair is only recomputed when its data or the
+settings change. Each entry is an .npz file with the GammaResult arrays,
+plus an optional .pdf with the rendered report page. The cache is bounded to
+``max_bytes``; the least recently used entries are evicted first.
+
+    cache = ResultCache("~/.cache/gamma")
+    engine.run_batch(reference, measurement, "report.pdf", cache=cache)
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from checkpoint import fingerprint
+from engine import GammaResult
+from scan_store import ScanHeader
+
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+# Bump when the stored result or page format changes
+CACHE_VERSION = 1
+
+
+class ResultCache:
+    """Size-bounded LRU cache of GammaResults and report pages in a directory."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        # key -> [last use, bytes of the .npz and .pdf files]
+        self.entries = {}
+        for name in os.listdir(self.directory):
+            key, extension = os.path.splitext(name)
+            if extension not in ('.npz', '.pdf'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entry = self.entries.setdefault(key, [0.0, 0])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+
+    @staticmethod
+    def key(ref_header, ref_points, mes_header, mes_points, gamma_config):
+        """Cache key of one pair under one gamma configuration."""
+        return fingerprint(CACHE_VERSION, ref_header, ref_points, mes_header, mes_points,
+                           gamma_config)
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def _touch(self, key):
+        now = time.time()
+        self.entries[key][0] = now
+        for extension in ('.npz', '.pdf'):
+            if os.path.exists(self._path(key, extension)):
+                os.utime(self._path(key, extension), (now, now))
+
+    def get(self, key):
+        """Cached GammaResult, or None."""
+        if key not in self.entries or not os.path.exists(self._path(key, '.npz')):
+            return None
+        try:
+            with np.load(self._path(key, '.npz')) as data:
+                meta = json.loads(str(data['meta']))
+                result = GammaResult(
+                    meta['measure_number'], meta['reference_number'],
+                    ScanHeader(*meta['ref_header']), ScanHeader(*meta['mes_header']),
+                    meta['direction'],
+                    data['axis_reference'], data['dose_reference'],
+                    data['axis_evaluation'], data['dose_evaluation'],
+                    data['gamma'], meta['pass_ratio']
+                )
+        except (OSError, ValueError, KeyError):
+            return None  # Unreadable entry; recomputed and overwritten
+        self._touch(key)
+        return result
+
+    def get_page(self, key):
+        """Cached report page (PDF bytes), or None."""
+        if key not in self.entries or not os.path.exists(self._path(key, '.pdf')):
+            return None
+        with open(self._path(key, '.pdf'), 'rb') as file:
+            page = file.read()
+        self._touch(key)
+        return page
+
+    def put(self, key, result, page=None):
+        """Store a GammaResult and, optionally, its report page."""
+        meta = {
+            'measure_number': result.measure_number,
+            'reference_number': result.reference_number,
+            'ref_header': list(result.ref_header),
+            'mes_header': list(result.mes_header),
+            'direction': result.direction,
+            'pass_ratio': float(result.pass_ratio),
+        }
+        path = self._path(key, '.npz')
+        with open(path + '.tmp', 'wb') as file:
+            np.savez(file, meta=json.dumps(meta),
+                     axis_reference=result.axis_reference,
+                     dose_reference=result.dose_reference,
+                     axis_evaluation=result.axis_evaluation,
+                     dose_evaluation=result.dose_evaluation,
+                     gamma=result.gamma)
+        os.replace(path + '.tmp', path)
+        self._stored(key)
+        if page is not None:
+            self.put_page(key, page)
+
+    def put_page(self, key, page):
+        """Store the report page (PDF bytes) of a cached result."""
+        path = self._path(key, '.pdf')
+        with open(path + '.tmp', 'wb') as file:
+            file.write(page)
+        os.replace(path + '.tmp', path)
+        self._stored(key)
+
+    def _stored(self, key):
+        """Account for new or replaced files of ``key``, then evict."""
+        size = sum(os.path.getsize(self._path(key, extension))
+                   for extension in ('.npz', '.pdf')
+                   if os.path.exists(self._path(key, extension)))
+        self.entries[key] = [time.time(), size]
+        self._evict(keep=key)
+
+    @property
+    def size(self):
+        return sum(size for _, size in self.entries.values())
+
+    def _evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.size
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k][0]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries.pop(key)[1]
+            for extension in ('.npz', '.pdf'):
+                try:
+                    os.remove(self._path(key, extension))
+                except FileNotFoundError:
+                    pass
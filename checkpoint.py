@@ -0,0 +1,143 @@
+"""
+Checkpointed, streaming report output.
+
+Every finished pair is written straight to disk as its own one-page PDF in a
+checkpoint directory next to the final report, and recorded in an
+append-only manifest. Memory use does not grow with the batch, a crash loses
+at most the pair in progress, and a rerun of the same batch resumes from the
+manifest. merge() assembles the final PDF in pair order and the directory is
+removed once the report is complete.
+
+Layout of ``<report>.pdf.partial/``:
+
+    manifest.jsonl       first line {"fingerprint": ...}, then one record per pair
+    page_00000.pdf ...   one page per rendered pair, named by pair index
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+MANIFEST = 'manifest.jsonl'
+
+
+def checkpoint_dir(pdf_path):
+    """Checkpoint directory used for a report."""
+    return f"{os.fspath(pdf_path)}.partial"
+
+
+def fingerprint(*parts):
+    """SHA-256 over a mix of NumPy arrays and JSON-serialisable values."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if hasattr(part, 'tobytes'):
+            digest.update(str(part.shape).encode())
+            digest.update(part.tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class PageCheckpoint:
+    """Per-pair results and pages of one batch, persisted as they complete.
+
+    An existing checkpoint with the same fingerprint is resumed; one written
+    for different inputs or settings is discarded.
+    """
+
+    def __init__(self, directory, run_fingerprint):
+        self.directory = directory
+        self.fingerprint = run_fingerprint
+        self.done = {}  # pair index -> (pass ratio, error, page file or None)
+        self.summaries = {}  # pair index -> engine.pair_summary of the result, if any
+
+        manifest = os.path.join(directory, MANIFEST)
+        if os.path.exists(manifest) and self._load(manifest):
+            return
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        with open(manifest, 'w') as file:
+            file.write(json.dumps({'fingerprint': run_fingerprint}) + '\n')
+
+    def _load(self, manifest):
+        """Read an existing manifest; False when it belongs to another run."""
+        with open(manifest, 'r+b') as file:
+            content = file.read()
+            complete = content.rfind(b'\n') + 1
+            if complete < len(content):
+                # Torn last line from an interrupted write: cut it off so the
+                # next record does not get appended onto the fragment
+                file.truncate(complete)
+        lines = content[:complete].decode().splitlines()
+        try:
+            if json.loads(lines[0])['fingerprint'] != self.fingerprint:
+                return False
+        except (IndexError, KeyError, ValueError):
+            return False
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self.done[record['index']] = (record['pass_ratio'], record['error'],
+                                          record['page'])
+            if record.get('summary') is not None:
+                self.summaries[record['index']] = record['summary']
+        return True
+
+    def save(self, index, pass_ratio, error, page=None, summary=None):
+        """Write the page (PDF bytes) of one pair, then record the pair.
+
+        ``summary`` is a JSON-serialisable dict of per-pair statistics kept
+        with the record, so resumed pairs can still be exported.
+        """
+        page_name = None
+        if page is not None:
+            page_name = f"page_{index:05d}.pdf"
+            path = os.path.join(self.directory, page_name)
+            with open(path + '.tmp', 'wb') as file:
+                file.write(page)
+            os.replace(path + '.tmp', path)
+
+        if pass_ratio is not None:
+            pass_ratio = float(pass_ratio)
+        record = {'index': index, 'pass_ratio': pass_ratio, 'error': error, 'page': page_name,
+                  'summary': summary}
+        with open(os.path.join(self.directory, MANIFEST), 'a') as file:
+            file.write(json.dumps(record) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.done[index] = (pass_ratio, error, page_name)
+        if summary is not None:
+            self.summaries[index] = summary
+
+    def merge(self, pdf_path):
+        """Write the pages in pair order to ``pdf_path``; returns the page count.
+
+        Nothing is written when no pair has a page.
+        """
+        from pypdf import PdfWriter
+
+        pages = [self.done[index][2] for index in sorted(self.done)
+                 if self.done[index][2] is not None]
+        if not pages:
+            return 0
+
+        writer = PdfWriter()
+        for page in pages:
+            writer.append(os.path.join(self.directory, page))
+        # Every page embeds its own copy of the fonts (pypdf >= 4.3 dedupes them)
+        if hasattr(writer, 'compress_identical_objects'):
+            writer.compress_identical_objects()
+
+        tmp_path = f"{os.fspath(pdf_path)}.tmp"
+        with open(tmp_path, 'wb') as file:
+            writer.write(file)
+        os.replace(tmp_path, pdf_path)
+        return len(pages)
+
+    def discard(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
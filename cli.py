@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Headless batch runner for unattended gamma analysis.
+
+Usage:
+    python cli.py --ref baseline.txt --meas annual_qa.txt --out report.pdf
+    python cli.py --ref baseline.txt --meas "exports/*.txt" --out reports/
+    python cli.py --ref baselines/ --meas exports/ --out reports/
+    python cli.py --ref baseline.txt --meas exports/ --results-only
+    python cli.py --ref "baselines/*.txt" --meas annual_qa.txt --matrix --results-only
+
+--render failing writes pages only for profiles below the pass threshold;
+--results-only (same as --render none) skips all figures and just prints the
+table of pass rates, so --out is not needed.
+
+--cache DIR keeps gamma results and pages between runs; pairs whose scans and
+gamma settings are unchanged are not recomputed or re-rendered.
+
+--profile timings.json (or .csv) records wall time and CPU time of every
+stage and pair; --profile-memory adds peak memory (and slows the run down),
+--cprofile gamma adds cProfile statistics of that stage as timings.gamma.prof.
+
+--results results.csv (or .parquet) writes one row per matched pair (both
+headers, pass ratio, mean and maximum gamma, point counts, gamma and render
+time) plus a run summary as results.summary.json.
+
+--db qa.sqlite keeps every parsed file and every result in a SQLite database
+(see scan_db.py): files already ingested load without being parsed, and the
+stored results can be queried by beam, energy, field size, depth and date.
+
+With several reference files, each measurement file is paired with the
+reference file of the same name, or with --matrix the one measurement file
+is compared against every reference file (historical baselines, the TPS
+model...) and a table of pass rates per baseline is printed; the
+measurement is parsed once for all of them. With several pairs, --out is a directory
+and one PDF is written per measurement file.
+
+Exit code 0 when every matched profile passes, 1 when any profile fails,
+errors or a file pair has no matches, 2 on invalid arguments.
+"""
+
+import argparse
+import glob
+import os
+import sys
+from contextlib import nullcontext
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import engine
+from export import ResultsExport
+from instrumentation import STAGES, RunProfiler
+from profiles import NORMALIZATION_MODES
+
+ASCII_EXTENSIONS = ('.txt', '.asc')
+
+
+def expand_paths(pattern):
+    """Expand a file, directory or glob pattern into a sorted list of files."""
+    if os.path.isdir(pattern):
+        return sorted(
+            os.path.join(pattern, name) for name in os.listdir(pattern)
+            if name.lower().endswith(ASCII_EXTENSIONS)
+        )
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def pair_files(reference_paths, measurement_paths):
+    """Pair every measurement file with its reference file.
+
+    A single reference file is used for all measurements; otherwise files are
+    paired by name.
+    """
+    if len(reference_paths) == 1:
+        return [(reference_paths[0], path) for path in measurement_paths]
+
+    references = {os.path.basename(path): path for path in reference_paths}
+    pairs = []
+    for path in measurement_paths:
+        name = os.path.basename(path)
+        if name not in references:
+            raise ValueError(f"No reference file named {name} for {path}")
+        pairs.append((references[name], path))
+    return pairs
+
+
+def output_path(out, measurement_path, single, reference_path=None):
+    """PDF path for one measurement file (against ``reference_path`` in matrix mode)."""
+    if single and out.lower().endswith('.pdf'):
+        return out
+    stem = os.path.splitext(os.path.basename(measurement_path))[0]
+    if reference_path is not None:
+        stem += f"_vs_{os.path.splitext(os.path.basename(reference_path))[0]}"
+    return os.path.join(out, f"{stem}_gamma.pdf")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Batch 1D gamma analysis of IBA ASCII scan exports."
+    )
+    parser.add_argument('--ref', required=True,
+                        help="Reference file, directory or glob pattern")
+    parser.add_argument('--meas', required=True,
+                        help="Measurement file, directory or glob pattern")
+    parser.add_argument('--out',
+                        help="Output PDF (single pair) or output directory")
+    parser.add_argument('--pass-threshold', type=float,
+                        default=engine.PASS_THRESHOLD * 100,
+                        help="Minimum pass rate in percent (default: %(default)s)")
+    parser.add_argument('--gamma-engine', choices=engine.GAMMA_ENGINES,
+                        default=engine.DEFAULT_GAMMA_CONFIG['gamma_engine'],
+                        help="Gamma implementation (default: %(default)s)")
+    parser.add_argument('--normalization', choices=NORMALIZATION_MODES,
+                        default=engine.DEFAULT_GAMMA_CONFIG['normalization'],
+                        help="Dose every profile is normalised to (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes for gamma and page rendering; "
+                             "0 uses every CPU (default: %(default)s)")
+    parser.add_argument('--render', choices=engine.RENDER_MODES, default='all',
+                        help="Report pages to render: every profile, only profiles "
+                             "below the pass threshold, or none (default: %(default)s)")
+    parser.add_argument('--results-only', dest='render', action='store_const',
+                        const='none', help="Same as --render none")
+    parser.add_argument('--cache',
+                        help="Directory of cached results reused across runs")
+    parser.add_argument('--cache-size', type=float, default=512,
+                        help="Cache size limit in MB (default: %(default)s)")
+    parser.add_argument('--scan-cache', nargs='?', const=engine.DEFAULT_SCAN_CACHE_DIR,
+                        help="Directory of parsed-file copies for fast reloads "
+                             "(default when given without a value: %(const)s)")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Write per-stage and per-pair timings to PATH "
+                             "(.json or .csv)")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="Also record peak memory per stage with tracemalloc "
+                             "(several times slower)")
+    parser.add_argument('--cprofile', metavar='STAGE', choices=STAGES, action='append',
+                        default=[],
+                        help="Also collect cProfile statistics of STAGE, written next "
+                             "to the --profile file (repeatable; one of %(choices)s)")
+    parser.add_argument('--results', metavar='PATH',
+                        help="Write one row per matched pair to PATH (.csv or .parquet) "
+                             "and a run summary next to it")
+    parser.add_argument('--matrix', action='store_true',
+                        help="Compare one measurement file against every reference file "
+                             "and print a table of pass rates per reference")
+    parser.add_argument('--db', metavar='PATH',
+                        help="SQLite database the scans are loaded from (ingested on "
+                             "first use) and the results are stored in")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    reference_paths = expand_paths(args.ref)
+    measurement_paths = expand_paths(args.meas)
+    if not reference_paths:
+        parser.error(f"no reference files found for {args.ref}")
+    if not measurement_paths:
+        parser.error(f"no measurement files found for {args.meas}")
+
+    if args.out is None and args.render != 'none':
+        parser.error("--out is required unless --results-only is given")
+    if (args.cprofile or args.profile_memory) and args.profile is None:
+        parser.error("--cprofile and --profile-memory need --profile")
+
+    if args.matrix:
+        if len(measurement_paths) != 1:
+            parser.error(f"--matrix needs one measurement file, found {len(measurement_paths)}")
+        pairs = [(path, measurement_paths[0]) for path in reference_paths]
+    else:
+        try:
+            pairs = pair_files(reference_paths, measurement_paths)
+        except ValueError as e:
+            parser.error(str(e))
+
+    single = len(pairs) == 1
+    if args.out is not None and not (single and args.out.lower().endswith('.pdf')):
+        os.makedirs(args.out, exist_ok=True)
+
+    threshold = args.pass_threshold / 100
+    workers = args.workers or os.cpu_count() or 1
+    gamma_config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine=args.gamma_engine,
+                        normalization=args.normalization)
+    cache = None
+    if args.cache is not None:
+        from cache import ResultCache
+        cache = ResultCache(args.cache, max_bytes=int(args.cache_size * 2 ** 20))
+    export = None
+    if args.results is not None:
+        try:
+            export = ResultsExport(args.results, threshold, gamma_config)
+        except Exception as e:
+            parser.error(str(e))
+    db = None
+    if args.db is not None:
+        from scan_db import ScanDatabase
+        try:
+            db = ScanDatabase(args.db)
+        except Exception as e:
+            parser.error(str(e))
+    loaded = {}  # path -> ScanSet, so each file is parsed once
+    total = passed = 0
+    failures = []
+    matrix = {}  # reference label -> run_batch results (None when it failed)
+
+    def load(path):
+        if path not in loaded:
+            if db is not None:
+                loaded[path] = db.load(path)
+            else:
+                loaded[path] = engine.load_scans(path, cache_dir=args.scan_cache)
+        return loaded[path]
+
+    # The results file takes its per-pair timings from the profiler
+    profiler = None
+    if args.profile is not None or export is not None:
+        profiler = RunProfiler(args.cprofile, trace_memory=args.profile_memory)
+    with profiler or nullcontext(), export or nullcontext(), db or nullcontext():
+        for reference_path, measurement_path in pairs:
+            print(f"\n{measurement_path} vs {reference_path}")
+            name = measurement_path
+            if args.matrix:
+                name = f"{measurement_path} vs {reference_path}"
+                label = os.path.splitext(os.path.basename(reference_path))[0]
+                label = reference_path if label in matrix else label
+                matrix[label] = None
+            if export is not None:
+                export.begin(reference_path, measurement_path)
+            try:
+                reference_scans = load(reference_path)
+                measurement_scans = load(measurement_path)
+                if db is not None:
+                    db.begin(reference_path, measurement_path, gamma_config)
+                pdf_path = None
+                if args.out is not None:
+                    pdf_path = output_path(args.out, measurement_path, single,
+                                           reference_path if args.matrix else None)
+                results = engine.run_batch(
+                    reference_scans, measurement_scans, pdf_path,
+                    gamma_config, workers=workers, render=args.render, threshold=threshold,
+                    cache=cache, export=[export, db]
+                )
+            except Exception as e:
+                failures.append(f"{name}: {str(e)}")
+                continue
+
+            if args.matrix:
+                matrix[label] = results
+            if not results:
+                failures.append(f"{name}: no matching measurement pairs")
+                continue
+
+            for measure_num, ref_num, pass_ratio, error in results:
+                total += 1
+                if error is not None:
+                    failures.append(f"{name} #{measure_num}: {error}")
+                elif pass_ratio >= threshold:
+                    passed += 1
+                else:  # below the threshold, or NaN
+                    failures.append(f"{name} #{measure_num} vs #{ref_num}: "
+                                    f"{pass_ratio * 100:.2f}% pass rate")
+            print(engine.format_results_table(results, threshold))
+            if any(error is None and engine.should_render(pass_ratio, args.render, threshold)
+                   for _, _, pass_ratio, error in results):
+                print(f"PDF saved: {pdf_path}")
+
+    if args.matrix:
+        print(f"\n{measurement_paths[0]} against {len(matrix)} reference files")
+        print(engine.format_matrix_table(matrix, threshold))
+    if export is not None:
+        print(f"Results saved: {export.path}")
+    if args.profile is not None:
+        print(f"\n{profiler.format_summary()}")
+        for path in profiler.write(args.profile):
+            print(f"Timings saved: {path}")
+
+    print(f"\n{'='*60}")
+    print(f"{passed}/{total} profiles passed (threshold {args.pass_threshold:g}%)")
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    print(f"{'='*60}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+"""
+Test data shared by the test modules.
+
+Tests take the ``scan_pair`` fixture; their manual runners (python test_x.py)
+pass load_scan_pair() instead.
+"""
+
+import pytest
+
+import engine
+
+
+def load_scan_pair():
+    """Reference and measurement ScanSets of the bundled test data."""
+    return (engine.load_scans("test_data_reference.txt"),
+            engine.load_scans("test_data_measurement.txt"))
+
+
+@pytest.fixture
+def scan_pair():
+    return load_scan_pair()
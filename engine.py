@@ -0,0 +1,665 @@
+"""
+GUI-free gamma analysis engine.
+
+Public API used by the Tk application (main.py), the command-line runner
+(cli.py) and the tests:
+
+    load_scans(filepath)                  -> ScanSet
+    open_scans(filepath)                  -> ScanCatalog (points read on demand)
+    fill_scan_cache(filepath, cache_dir)  (parsed copy reused by open_scans)
+    match_scans(measurement_scans, reference_scans)
+                                          -> [[measurement number, reference number], ...]
+    compute_gamma(measurement_scans, reference_scans,
+                  measure_number, reference_number, gamma_config)
+                                          -> GammaResult
+    render_report(result, pdf_pages, gamma_config)
+
+compute_gamma_batch(measurement_scans, reference_scans, matches, gamma_config)
+returns the GammaResults of many pairs at once, keyed by pair.
+run_batch(..., render='none') skips figures entirely and only returns pass
+rates; format_results_table turns its results into a printable table.
+
+Every stage (parse, normalize, match, gamma, render, ...) is timed while an
+instrumentation.RunProfiler is active; see instrumentation.py.
+
+matplotlib and pymedphys are imported on first use, so importing this module
+only costs NumPy.
+"""
+
+import io
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import NamedTuple
+
+import numpy as np
+
+from checkpoint import PageCheckpoint, checkpoint_dir, fingerprint
+from gamma1d import gamma_1d, gamma_1d_batch
+from instrumentation import RunProfiler, active_profiler, pair_label, stage
+from matching import find_matches
+from profiles import CROSSLINE, DEFAULT_NORMALIZATION, INLINE, prepare_profiles
+from scan_store import (DEFAULT_SCAN_CACHE_DIR, X, Y, DOSE, ScanCatalog, ScanHeader,
+                        load_scan_set, read_scan_cache)
+
+# Default gamma analysis parameters
+DEFAULT_GAMMA_CONFIG = {
+    'dose_percent_threshold': 2,
+    'distance_mm_threshold': 2,
+    'lower_percent_dose_cutoff': 50,
+    'interp_fraction': 10,
+    'max_gamma': 2,
+    'random_subset': None,
+    'local_gamma': False,
+    'ram_available': 2 ** 29,
+    'gamma_engine': 'pymedphys',  # or 'numpy' for the native 1D kernel
+    'normalization': DEFAULT_NORMALIZATION  # see profiles.NORMALIZATION_MODES
+}
+
+GAMMA_ENGINES = ('pymedphys', 'numpy')
+
+# Minimum pass ratio for a profile to count as passing
+PASS_THRESHOLD = 0.95
+
+# Which pairs run_batch renders: every pair, only pairs below the pass
+# threshold, or none (results only, no figures and no PDF)
+RENDER_MODES = ('all', 'failing', 'none')
+
+# Pairs evaluated together by the sequential runner; bounds the number of
+# gamma results held in memory at once
+BATCH_SIZE = 64
+
+
+class GammaResult(NamedTuple):
+    """Gamma evaluation of one matched pair, with everything needed to plot it."""
+    measure_number: float
+    reference_number: float
+    ref_header: ScanHeader
+    mes_header: ScanHeader
+    direction: str
+    axis_reference: np.ndarray
+    dose_reference: np.ndarray
+    axis_evaluation: np.ndarray
+    dose_evaluation: np.ndarray
+    gamma: np.ndarray
+    pass_ratio: float
+
+
+def load_scans(filepath, cache_dir=None):
+    """Parse an IBA ASCII file into a ScanSet (see scan_store for ``cache_dir``)."""
+    with stage('parse', item=str(filepath)):
+        scans = load_scan_set(filepath, cache_dir)
+    print(f"Total measurements in file: {len(scans)}")
+    return scans
+
+
+def open_scans(filepath, cache_dir=None):
+    """Open an IBA ASCII file without reading its data points.
+
+    Returns an up-to-date parsed copy from ``cache_dir`` when there is one,
+    otherwise a ScanCatalog that reads each scan's points the first time it
+    is used (in practice only the scans that match). Opening never parses
+    the whole file; fill_scan_cache saves the copy for next time.
+    """
+    with stage('parse', item=str(filepath)):
+        scans = None
+        if cache_dir is not None:
+            scans = read_scan_cache(filepath, cache_dir)
+        if scans is None:
+            scans = ScanCatalog(filepath)
+    print(f"Total measurements in file: {len(scans)}")
+    return scans
+
+
+def fill_scan_cache(filepath, cache_dir):
+    """Save the parsed copy of an ASCII file that open_scans reads from ``cache_dir``.
+
+    Parses the whole file unless an up-to-date copy already exists, so call
+    it off the critical path (the GUI runs it on a background thread).
+    """
+    load_scan_set(filepath, cache_dir)
+
+
+def match_scans(measurement_scans, reference_scans):
+    """Find matching measurement pairs between reference and measurement datasets."""
+    with stage('match'):
+        matches, ambiguous = find_matches(
+            measurement_scans.headers, reference_scans.headers
+        )
+
+    for measure_num, ref_num in matches:
+        measure, _ = measurement_scans.index[measure_num]
+        print(f"  ✓ Matched: {measure.beam_type} {measure.energy}MV, "
+              f"{measure.field_size_x}mm, depth {measure.start_z}mm")
+    for measure_num, ref_nums in ambiguous:
+        print(f"  ⚠ Measurement {measure_num} has {len(ref_nums)} equally close "
+              f"references {ref_nums}; using {ref_nums[0]}")
+
+    return matches
+
+
+def prepare_profile(points):
+    """Normalize one scan to the central axis, sort it and drop the end points.
+
+    Returns (x, y, normalised dose). Loaded files prepare all their scans at
+    once (see profiles.py and ScanSet.profile); this is for a lone scan.
+    """
+    _, x, y, dose = prepare_profiles(points[:, X], points[:, Y], points[:, DOSE],
+                                     [0, len(points)]).profile(0)
+    return x, y, dose
+
+
+def compute_gamma(measurement_scans, reference_scans, measure_number,
+                  reference_number, gamma_config=None):
+    """Run gamma analysis on a single matched measurement pair."""
+    if gamma_config is None:
+        gamma_config = DEFAULT_GAMMA_CONFIG
+    normalization = gamma_config.get('normalization', DEFAULT_NORMALIZATION)
+
+    # Prepared profiles of this measurement pair
+    ref_header, ref_profile = reference_scans.profile(reference_number, normalization)
+    mes_header, mes_profile = measurement_scans.profile(measure_number, normalization)
+    return evaluate_pair(ref_header, ref_profile, mes_header, mes_profile, gamma_config)
+
+
+def _gamma_options(gamma_config):
+    """Split gamma_config into (gamma engine, keyword arguments of the gamma function)."""
+    options = dict(gamma_config)
+    options.pop('normalization', None)  # applied when the profiles are prepared
+    return options.pop('gamma_engine', 'pymedphys'), options
+
+
+def gamma_index(axis_reference, dose_reference, axis_evaluation, dose_evaluation,
+                gamma_config):
+    """Gamma of one profile with the engine selected by gamma_config['gamma_engine']."""
+    gamma_engine, options = _gamma_options(gamma_config)
+
+    if gamma_engine == 'numpy':
+        return gamma_1d(axis_reference, dose_reference,
+                        axis_evaluation, dose_evaluation, **options)
+    if gamma_engine == 'pymedphys':
+        import pymedphys
+        return pymedphys.gamma(axis_reference, dose_reference,
+                               axis_evaluation, dose_evaluation, **options)
+    raise Exception(f"Unknown gamma engine: {gamma_engine}")
+
+
+def pair_profiles(ref_profile, mes_profile):
+    """Pick the scan axis of a pair from its prepared profiles.
+
+    Each profile is (direction, x, y, normalised dose) as returned by
+    ScanSet.profile; the reference scan's direction decides the axis.
+    Returns (direction, axis_reference, dose_reference, axis_evaluation,
+    dose_evaluation).
+    """
+    direction, ref_xpos, ref_ypos, ref_normal_dose = ref_profile
+    _, mes_xpos, mes_ypos, mes_normal_dose = mes_profile
+
+    # A scan without the dose its normalization mode needs (e.g. no point near
+    # the central axis for 'cax') cannot be normalised
+    if not (np.isfinite(ref_normal_dose).all() and np.isfinite(mes_normal_dose).all()):
+        raise Exception("Cannot normalise profile (no normalization dose for this scan)")
+
+    if direction == INLINE:
+        return direction, ref_ypos, ref_normal_dose, mes_ypos, mes_normal_dose
+    if direction == CROSSLINE:
+        return direction, ref_xpos, ref_normal_dose, mes_xpos, mes_normal_dose
+    raise Exception("Cannot determine scan direction (neither inline nor crossline)")
+
+
+def _gamma_result(ref_header, mes_header, profiles, gamma):
+    """Assemble the GammaResult of one pair and log its pass rate."""
+    direction = profiles[0]
+    valid_gamma = gamma[~np.isnan(gamma)]
+    if not len(valid_gamma):
+        raise Exception("No gamma values to evaluate (profiles do not overlap above "
+                        "the dose cutoff)")
+    pass_ratio = np.sum(valid_gamma <= 1) / len(valid_gamma)
+
+    print(f"  ✓ {ref_header.beam_type} {ref_header.energy}MV "
+          f"({direction}): {pass_ratio*100:.2f}% pass rate")
+
+    return GammaResult(
+        mes_header.number, ref_header.number, ref_header, mes_header,
+        *profiles, gamma, pass_ratio
+    )
+
+
+def pair_summary(result):
+    """Per-pair statistics of a GammaResult as a JSON-serialisable dict."""
+    valid_gamma = result.gamma[~np.isnan(result.gamma)]
+    return {
+        'direction': result.direction,
+        'pass_ratio': float(result.pass_ratio),
+        'gamma_mean': float(np.mean(valid_gamma)) if len(valid_gamma) else None,
+        'gamma_max': float(np.max(valid_gamma)) if len(valid_gamma) else None,
+        'points_reference': len(result.axis_reference),
+        'points_evaluation': len(result.axis_evaluation),
+        'points_evaluated': len(valid_gamma),
+    }
+
+
+def evaluate_pair(ref_header, ref_profile, mes_header, mes_profile, gamma_config=None):
+    """Run gamma analysis on the prepared profiles of one reference/measurement pair."""
+    if gamma_config is None:
+        gamma_config = DEFAULT_GAMMA_CONFIG
+
+    profiles = pair_profiles(ref_profile, mes_profile)
+    with stage('gamma', item=pair_label(mes_header.number, ref_header.number)):
+        gamma = gamma_index(*profiles[1:], gamma_config)
+    return _gamma_result(ref_header, mes_header, profiles, gamma)
+
+
+def compute_gamma_batch(measurement_scans, reference_scans, matches, gamma_config=None):
+    """Run gamma analysis on many matched pairs at once.
+
+    With the numpy engine every profile is evaluated in one vectorized pass
+    (gamma1d.gamma_1d_batch); other engines are called per pair.
+
+    Returns (results, errors): GammaResults and error messages, both keyed by
+    (measurement number, reference number).
+    """
+    if gamma_config is None:
+        gamma_config = DEFAULT_GAMMA_CONFIG
+
+    normalization = gamma_config.get('normalization', DEFAULT_NORMALIZATION)
+
+    prepared = {}
+    errors = {}
+    for measure_num, ref_num in matches:
+        try:
+            ref_header, ref_profile = reference_scans.profile(ref_num, normalization)
+            mes_header, mes_profile = measurement_scans.profile(measure_num, normalization)
+            prepared[(measure_num, ref_num)] = (
+                ref_header, mes_header, pair_profiles(ref_profile, mes_profile)
+            )
+        except Exception as e:
+            errors[(measure_num, ref_num)] = str(e)
+
+    gamma_engine, options = _gamma_options(gamma_config)
+    if gamma_engine == 'numpy':
+        # One vectorized pass: timed as a whole, not per pair
+        with stage('gamma', count=len(prepared)):
+            gammas, _ = gamma_1d_batch(
+                [profiles[1:] for _, _, profiles in prepared.values()], **options
+            )
+    else:
+        gammas = []
+        for (measure_num, ref_num), (_, _, profiles) in prepared.items():
+            with stage('gamma', item=pair_label(measure_num, ref_num)):
+                gammas.append(gamma_index(*profiles[1:], gamma_config))
+
+    results = {}
+    for (key, (ref_header, mes_header, profiles)), gamma in zip(prepared.items(), gammas):
+        try:
+            results[key] = _gamma_result(ref_header, mes_header, profiles, gamma)
+        except Exception as e:
+            errors[key] = str(e)
+    return results, errors
+
+
+# Report template reused across pages while the gamma configuration is unchanged
+_report_template = None
+
+
+def render_report(result, pdf_pages, gamma_config=None):
+    """Add the gamma analysis report page for one result to an open PdfPages.
+
+    The page layout is built once (see report.ReportTemplate) and refilled for
+    every result rendered with the same gamma configuration.
+    """
+    global _report_template
+    from report import ReportTemplate
+
+    if gamma_config is None:
+        gamma_config = DEFAULT_GAMMA_CONFIG
+    if _report_template is None or _report_template.gamma_config != gamma_config:
+        _report_template = ReportTemplate(gamma_config)
+    _report_template.render(result, pdf_pages)
+
+
+def _init_worker():
+    """Process-pool initializer: workers only ever render off-screen."""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def _render_page(result, gamma_config):
+    """Report page for one result as the bytes of a one-page PDF."""
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    buffer = io.BytesIO()
+    with stage('render', item=pair_label(result.measure_number, result.reference_number)):
+        with PdfPages(buffer) as pdf_pages:
+            render_report(result, pdf_pages, gamma_config)
+    return buffer.getvalue()
+
+
+def _gamma_page_task(task):
+    """Process-pool task: gamma for one pair, rendered to a one-page PDF.
+
+    Returns (GammaResult, PDF bytes or None when the page is not rendered,
+    error, stage records); errors are returned rather than raised so one bad
+    pair does not abort the batch. Stage records (see instrumentation.py) are
+    only collected when ``profile`` is 'time' or 'memory', otherwise the list
+    is empty.
+    """
+    (ref_header, ref_profile, mes_header, mes_profile, gamma_config, render, threshold,
+     profile) = task
+    profiler = RunProfiler(trace_memory=profile == 'memory') if profile else None
+    with profiler or nullcontext():
+        try:
+            result = evaluate_pair(ref_header, ref_profile, mes_header, mes_profile,
+                                   gamma_config)
+            page = None
+            if should_render(result.pass_ratio, render, threshold):
+                page = _render_page(result, gamma_config)
+            outcome = result, page, None
+        except Exception as e:
+            outcome = None, None, str(e)
+    return (*outcome, profiler.records if profiler else [])
+
+
+def should_render(pass_ratio, render='all', threshold=PASS_THRESHOLD):
+    """Whether a pair with this pass ratio gets a report page in ``render`` mode."""
+    if render == 'all':
+        return True
+    if render == 'failing':
+        return not pass_ratio >= threshold  # NaN pass ratios are rendered too
+    if render == 'none':
+        return False
+    raise Exception(f"Unknown render mode '{render}' (expected one of {RENDER_MODES})")
+
+
+def _run_sequential(measurement_scans, reference_scans, matches, pending, gamma_config,
+                    render, threshold):
+    """Evaluate the pending pairs in batches of BATCH_SIZE, rendering as they finish.
+
+    Only the numpy engine gains from batching; other engines evaluate one pair
+    at a time so every pair is yielded (and reported) as soon as it is done.
+    Yields (pair index, GammaResult, page bytes or None, error) per pair.
+    """
+    batch_size = BATCH_SIZE if _gamma_options(gamma_config)[0] == 'numpy' else 1
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        results, errors = compute_gamma_batch(measurement_scans, reference_scans,
+                                              [matches[index] for index in batch],
+                                              gamma_config)
+        for index in batch:
+            key = tuple(matches[index])
+            if key in errors:
+                yield index, None, None, errors[key]
+                continue
+            result = results.pop(key)
+            try:
+                page = None
+                if should_render(result.pass_ratio, render, threshold):
+                    page = _render_page(result, gamma_config)
+            except Exception as e:
+                yield index, None, None, str(e)
+                continue
+            yield index, result, page, None
+
+
+def _run_parallel(tasks, workers):
+    """Evaluate and render (pair index, task) items in a process pool.
+
+    Yields (pair index, GammaResult, page bytes or None, error) in completion
+    order.
+    """
+    # Spawned (not forked) workers: forking after numba or Tk have started
+    # threads can deadlock the children.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker) as executor:
+        futures = {executor.submit(_gamma_page_task, task): index for index, task in tasks}
+        try:
+            for future in as_completed(futures):
+                result, page, error, records = future.result()
+                if records:
+                    active_profiler().add_records(records)
+                yield futures.pop(future), result, page, error
+        finally:
+            # Closed early (cancelled): drop the pairs not yet started
+            executor.shutdown(cancel_futures=True)
+
+
+def format_results_table(results, threshold=PASS_THRESHOLD):
+    """Plain-text table of run_batch results, one row per matched pair."""
+    lines = [f"{'Measurement':>11}  {'Reference':>9}  {'Pass rate':>9}  Status",
+             f"{'-'*11}  {'-'*9}  {'-'*9}  {'-'*6}"]
+    for measure_num, ref_num, pass_ratio, error in results:
+        if error is not None:
+            rate, status = '-', f"ERROR: {error}"
+        else:
+            rate = f"{pass_ratio*100:.2f}%"
+            status = 'PASS' if pass_ratio >= threshold else 'FAIL'
+        lines.append(f"{measure_num:>11g}  {ref_num:>9g}  {rate:>9}  {status}")
+    return "\n".join(lines)
+
+
+def format_matrix_table(matrix, threshold=PASS_THRESHOLD):
+    """Plain-text table of one measurement file against several baselines.
+
+    ``matrix`` maps a baseline label to its run_batch results (None when the
+    baseline could not be compared at all). One row per measurement scan and
+    one column per baseline, then the passed count and mean pass rate of
+    every baseline; '-' marks a scan without a match in that baseline.
+    """
+    labels = list(matrix)
+    cells = {}  # measurement number -> {label: cell text}
+    passed, mean = {}, {}
+    for label, results in matrix.items():
+        if results is None:
+            passed[label] = mean[label] = 'ERROR'
+            continue
+        ratios = []
+        for measure_num, _, pass_ratio, error in results:
+            if error is not None:
+                cell = 'ERROR'
+            else:
+                ratios.append(pass_ratio)
+                cell = f"{pass_ratio*100:.2f}% {'✓' if pass_ratio >= threshold else '✗'}"
+            cells.setdefault(measure_num, {})[label] = cell
+        passed[label] = f"{sum(ratio >= threshold for ratio in ratios)}/{len(results)}"
+        mean[label] = f"{np.mean(ratios)*100:.2f}%" if ratios else '-'
+
+    widths = [max(len(label), 9) for label in labels]
+
+    def line(first, values):
+        return "  ".join([f"{first:>11}"] + [f"{value:>{width}}"
+                                              for value, width in zip(values, widths)])
+
+    lines = [line('Measurement', labels), line('-'*11, ['-'*width for width in widths])]
+    for measure_num in sorted(cells):
+        lines.append(line(f"{measure_num:g}", [cells[measure_num].get(label, '-')
+                                               for label in labels]))
+    lines.append(line('-'*11, ['-'*width for width in widths]))
+    lines.append(line('Passed', [passed[label] for label in labels]))
+    lines.append(line('Mean', [mean[label] for label in labels]))
+    return "\n".join(lines)
+
+
+def _cached_outcomes(cache, measurement_scans, reference_scans, matches, pending,
+                     gamma_config, render, threshold):
+    """Look the pending pairs up in a ResultCache.
+
+    Returns ({pair index: cache key}, [(pair index, GammaResult, page, None)]
+    for the pairs found). A page missing from the cache is rendered from the
+    cached result.
+    """
+    keys = {}
+    hits = []
+    for index in pending:
+        measure_num, ref_num = matches[index]
+        ref_header, ref_points = reference_scans.scan(ref_num)
+        mes_header, mes_points = measurement_scans.scan(measure_num)
+        keys[index] = cache.key(ref_header, ref_points, mes_header, mes_points, gamma_config)
+
+        result = cache.get(keys[index])
+        if result is None:
+            continue
+        page = None
+        if should_render(result.pass_ratio, render, threshold):
+            page = cache.get_page(keys[index])
+            if page is None:
+                try:
+                    page = _render_page(result, gamma_config)
+                except Exception:
+                    continue  # Recomputed, so the error is reported as usual
+                cache.put_page(keys[index], page)
+        hits.append((index, result, page, None))
+    return keys, hits
+
+
+def run_batch(reference_scans, measurement_scans, pdf_path, gamma_config=None,
+              workers=1, render='all', threshold=PASS_THRESHOLD, cache=None,
+              progress=None, cancel=None, export=None):
+    """Match two loaded files, run gamma on every pair and write the PDF report.
+
+    With ``workers`` > 1 the pairs are evaluated and rendered in a process pool;
+    pages keep the match order either way. Each finished pair is checkpointed
+    next to ``pdf_path`` (see checkpoint.py), so rerunning an interrupted batch
+    only processes the remaining pairs; the final PDF is assembled at the end.
+    With a ``cache`` (cache.ResultCache), pairs whose scans and gamma_config
+    are unchanged since an earlier run reuse the stored result and page.
+    ``render`` selects the pairs that get a page (see RENDER_MODES): 'failing'
+    renders pairs whose pass ratio is below ``threshold``, 'none' builds no
+    figures at all and ``pdf_path`` may be None.
+
+    ``progress(done, total)`` is called once the pairs are matched and after
+    every finished pair. Setting ``cancel`` (a threading.Event) stops the batch
+    after the pair in progress; the checkpoint is kept so a rerun resumes, no
+    PDF is written and only the finished pairs are returned.
+
+    ``export`` (export.ResultsExport or scan_db.ScanDatabase, or a list of
+    them) receives the row of every pair as it finishes, including pairs
+    resumed from the checkpoint.
+
+    Returns one (measurement number, reference number, pass ratio, error) tuple
+    per matched pair; pass ratio is None and error holds the message when the
+    pair failed. No PDF is written when no page is rendered, and a report
+    already at ``pdf_path`` from an earlier run is removed.
+    """
+    if gamma_config is None:
+        gamma_config = DEFAULT_GAMMA_CONFIG
+    should_render(1.0, render)  # validate the mode before any work
+
+    matches = match_scans(measurement_scans, reference_scans)
+    if not matches:
+        return []
+
+    print(f"\nFound {len(matches)} matching measurement pairs")
+    print("Running gamma analysis...")
+
+    if pdf_path is None:
+        checkpoint = None
+        render = 'none'
+        done = {}
+    else:
+        # Only the matched scans identify the run (and only they are read
+        # from a ScanCatalog)
+        pair_data = []
+        for measure_num, ref_num in matches:
+            pair_data.extend(reference_scans.scan(ref_num) + measurement_scans.scan(measure_num))
+        checkpoint = PageCheckpoint(checkpoint_dir(pdf_path), fingerprint(
+            *pair_data, matches, gamma_config, render, threshold
+        ))
+        done = {index: record[:2] for index, record in checkpoint.done.items()}
+        if done:
+            print(f"Resuming: {len(done)} of {len(matches)} pairs already done")
+
+    exports = export if isinstance(export, (list, tuple)) else [export]
+    exports = [sink for sink in exports if sink is not None]
+
+    def export_pair(index, summary, error):
+        measure_num, ref_num = matches[index]
+        for sink in exports:
+            sink.add(measure_num, ref_num, reference_scans.index[ref_num][0],
+                     measurement_scans.index[measure_num][0], summary, error)
+
+    if exports:
+        for index in sorted(done):
+            pass_ratio, error = done[index]
+            summary = checkpoint.summaries.get(index)
+            if summary is None and pass_ratio is not None:
+                summary = {'pass_ratio': pass_ratio}  # checkpointed before summaries
+            export_pair(index, summary, error)
+
+    pending = [index for index in range(len(matches)) if index not in done]
+    if progress is not None:
+        progress(len(done), len(matches))
+    cache_keys, hits, reused = {}, [], set()
+    if cache is not None and pending:
+        with stage('cache', count=len(pending)):
+            cache_keys, hits = _cached_outcomes(cache, measurement_scans, reference_scans,
+                                                matches, pending, gamma_config, render,
+                                                threshold)
+        print(f"Cache: {len(hits)} of {len(pending)} pairs unchanged")
+        reused = {index for index, _, _, _ in hits}
+        pending = [index for index in pending if index not in reused]
+
+    if workers > 1 and len(pending) > 1:
+        normalization = gamma_config.get('normalization', DEFAULT_NORMALIZATION)
+        # Workers time their pairs the same way as the active profiler
+        profile = None
+        if active_profiler() is not None:
+            profile = 'memory' if active_profiler().trace_memory else 'time'
+        tasks = []
+        for index in pending:
+            measure_num, ref_num = matches[index]
+            ref_header, ref_profile = reference_scans.profile(ref_num, normalization)
+            mes_header, mes_profile = measurement_scans.profile(measure_num, normalization)
+            tasks.append((index, (ref_header, ref_profile, mes_header, mes_profile,
+                                  gamma_config, render, threshold, profile)))
+        outcomes = _run_parallel(tasks, min(workers, len(tasks)))
+    else:
+        outcomes = _run_sequential(measurement_scans, reference_scans, matches, pending,
+                                   gamma_config, render, threshold)
+
+    # Pages go to the checkpoint as soon as each pair is done
+    cancelled = False
+    for index, result, page, error in itertools.chain(hits, outcomes):
+        pass_ratio = None if result is None else result.pass_ratio
+        summary = None if result is None else pair_summary(result)
+        label = pair_label(*matches[index])
+        if checkpoint is not None:
+            with stage('checkpoint', item=label):
+                checkpoint.save(index, pass_ratio, error, page, summary)
+        if cache is not None and result is not None and index not in reused:
+            with stage('cache', item=label):
+                cache.put(cache_keys[index], result, page)
+        done[index] = (pass_ratio, error)
+        if exports:
+            export_pair(index, summary, error)
+        if progress is not None:
+            progress(len(done), len(matches))
+        if cancel is not None and cancel.is_set():
+            cancelled = True
+            break
+    outcomes.close()  # stops the workers when cancelled
+
+    if cancelled:
+        print(f"Cancelled: {len(done)} of {len(matches)} pairs done"
+              + ("; rerun to resume" if checkpoint is not None else ""))
+    elif checkpoint is not None:
+        with stage('merge', item=str(pdf_path)):
+            pages = checkpoint.merge(pdf_path)
+        checkpoint.discard()
+        if not pages and os.path.exists(pdf_path):
+            # An earlier report must not pass for the result of this run
+            os.remove(pdf_path)
+            print(f"No pages rendered; removed previous report {pdf_path}")
+
+    results = []
+    for index, (measure_num, ref_num) in enumerate(matches):
+        if index not in done:
+            continue  # cancelled before this pair
+        pass_ratio, error = done[index]
+        if error is not None:
+            print(f"  ✗ Failed for measurement {measure_num}: {error}")
+        results.append((measure_num, ref_num, pass_ratio, error))
+
+    return results
@@ -0,0 +1,224 @@
+"""
+Machine-readable results export.
+
+ResultsExport writes one row per matched pair to a CSV or Parquet file as
+run_batch finishes the pairs, in chunks of CHUNK_SIZE rows, and a JSON
+summary of the whole run next to it when closed:
+
+    with ResultsExport("results.csv", threshold=0.95) as export:
+        export.begin("baseline.txt", "annual_qa.txt")
+        engine.run_batch(reference, measurement, "report.pdf", export=export)
+
+writes results.csv and results.summary.json. Each row holds both headers,
+the pass ratio, mean and maximum gamma, point counts and, while an
+instrumentation.RunProfiler is active, the pair's gamma and render times.
+Parquet output needs pyarrow, imported only when a .parquet file is asked for.
+"""
+
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from instrumentation import active_profiler, pair_label
+from scan_store import ScanHeader
+
+# Rows buffered before they are written out
+CHUNK_SIZE = 256
+
+# Per-pair timing columns, from the active RunProfiler's records. The numpy
+# engine evaluates pairs in one vectorized pass, so its pairs have no gamma
+# time of their own; the batch time is in the summary's stage totals.
+TIMED_STAGES = ('gamma', 'render')
+
+# Column name -> type ('str', 'float', 'int' or 'bool'), in file order
+COLUMNS = {
+    'reference_file': 'str', 'measurement_file': 'str',
+    'measurement': 'float', 'reference': 'float',
+    'direction': 'str', 'pass_ratio': 'float', 'passed': 'bool',
+    'gamma_mean': 'float', 'gamma_max': 'float',
+    'points_reference': 'int', 'points_evaluation': 'int', 'points_evaluated': 'int',
+    'error': 'str',
+}
+for _prefix in ('ref', 'mes'):
+    for _field, _type in ScanHeader.__annotations__.items():
+        if _field != 'number':
+            COLUMNS[f"{_prefix}_{_field}"] = 'float' if _type is float else 'str'
+for _stage in TIMED_STAGES:
+    COLUMNS[f"{_stage}_s"] = 'float'
+
+FORMATS = ('csv', 'parquet')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("Parquet output needs pyarrow (pip install pyarrow); "
+                        "use a .csv results file instead")
+    return pyarrow, pyarrow.parquet
+
+
+def summary_path(path):
+    """JSON summary written next to a results file."""
+    return f"{os.path.splitext(os.fspath(path))[0]}.summary.json"
+
+
+class ResultsExport:
+    """Streams per-pair result rows to ``path`` (.csv or .parquet)."""
+
+    def __init__(self, path, threshold=None, gamma_config=None, chunk_size=CHUNK_SIZE):
+        from engine import PASS_THRESHOLD
+
+        self.path = os.fspath(path)
+        self.format = os.path.splitext(self.path)[1].lower().lstrip('.')
+        if self.format not in FORMATS:
+            raise Exception(f"Unknown results format '{self.format}' (expected one of {FORMATS})")
+        if self.format == 'parquet':
+            _pyarrow()  # fail before the run rather than at the first chunk
+        self.threshold = PASS_THRESHOLD if threshold is None else threshold
+        self.gamma_config = gamma_config
+        self.chunk_size = chunk_size
+
+        self.files = (None, None)  # (reference file, measurement file) of the rows
+        self.runs = []  # per file pair: files and counts
+        self.pass_ratios = []
+        self.rows = 0
+        self._buffer = []
+        self._writer = None
+        self._file = None
+        self._timings = {}  # pair label -> {stage: seconds}
+        self._records_seen = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def begin(self, reference_file, measurement_file):
+        """Label the rows of the next run_batch with its files."""
+        self.files = (os.fspath(reference_file), os.fspath(measurement_file))
+        self.runs.append({'reference_file': self.files[0], 'measurement_file': self.files[1],
+                          'pairs': 0, 'passed': 0, 'errors': 0})
+
+    def _pair_timing(self, label):
+        """Seconds per timed stage of one pair, from the active profiler."""
+        profiler = active_profiler()
+        if profiler is None:
+            return {}
+        for record in profiler.records[self._records_seen:]:
+            if record['stage'] in TIMED_STAGES and record['item'] is not None:
+                stages = self._timings.setdefault(record['item'], {})
+                stages[record['stage']] = stages.get(record['stage'], 0.0) + record['wall_s']
+        self._records_seen = len(profiler.records)
+        return self._timings.pop(label, {})
+
+    def add(self, measure_num, ref_num, ref_header, mes_header, summary, error):
+        """Add the row of one pair; ``summary`` is engine.pair_summary() or None."""
+        summary = summary or {}
+        pass_ratio = summary.get('pass_ratio')
+        passed = error is None and pass_ratio is not None and pass_ratio >= self.threshold
+        row = {
+            'reference_file': self.files[0], 'measurement_file': self.files[1],
+            'measurement': measure_num, 'reference': ref_num,
+            'direction': summary.get('direction'), 'pass_ratio': pass_ratio,
+            'passed': passed,
+            'gamma_mean': summary.get('gamma_mean'), 'gamma_max': summary.get('gamma_max'),
+            'points_reference': summary.get('points_reference'),
+            'points_evaluation': summary.get('points_evaluation'),
+            'points_evaluated': summary.get('points_evaluated'),
+            'error': error,
+        }
+        for prefix, header in (('ref', ref_header), ('mes', mes_header)):
+            for field, value in header._asdict().items():
+                if field != 'number':
+                    row[f"{prefix}_{field}"] = value
+        timing = self._pair_timing(pair_label(measure_num, ref_num))
+        for stage in TIMED_STAGES:
+            row[f"{stage}_s"] = timing.get(stage)
+
+        if self.runs:
+            run = self.runs[-1]
+            run['pairs'] += 1
+            run['passed'] += passed
+            run['errors'] += error is not None
+        if error is None and pass_ratio is not None:
+            self.pass_ratios.append(pass_ratio)
+
+        self._buffer.append(row)
+        self.rows += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows."""
+        if not self._buffer:
+            return
+        if self.format == 'csv':
+            self._write_csv(self._buffer)
+        else:
+            self._write_parquet(self._buffer)
+        self._buffer = []
+
+    def _write_csv(self, rows):
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=list(COLUMNS))
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _write_parquet(self, rows):
+        pa, pq = _pyarrow()
+        types = {'str': pa.string(), 'float': pa.float64(), 'int': pa.int64(),
+                 'bool': pa.bool_()}
+        schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS.items()])
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, schema)
+        table = pa.Table.from_pydict(
+            {name: [row[name] for row in rows] for name in COLUMNS}, schema=schema
+        )
+        self._writer.write_table(table)
+
+    def summary(self):
+        """Run-level summary: counts, pass-rate statistics and stage timings."""
+        pass_ratios = np.array(self.pass_ratios, dtype=float)
+        passed = sum(run['passed'] for run in self.runs) if self.runs else None
+        errors = sum(run['errors'] for run in self.runs) if self.runs else None
+        profiler = active_profiler()
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results_file': self.path,
+            'threshold': self.threshold,
+            'gamma_config': self.gamma_config,
+            'pairs': self.rows,
+            'passed': passed,
+            'errors': errors,
+            'pass_ratio': None if not len(pass_ratios) else {
+                'mean': float(np.nanmean(pass_ratios)),
+                'min': float(np.nanmin(pass_ratios)),
+                'max': float(np.nanmax(pass_ratios)),
+            },
+            'runs': self.runs,
+            'stage_timing': None if profiler is None else profiler.summary(),
+        }
+
+    def close(self):
+        """Write the remaining rows and the JSON summary."""
+        self.flush()
+        if self._writer is None:  # no pairs at all: still write the header
+            if self.format == 'csv':
+                self._write_csv([])
+            else:
+                self._write_parquet([])
+        if self.format == 'csv':
+            self._file.close()
+        else:
+            self._writer.close()
+
+        with open(summary_path(self.path), 'w') as file:
+            json.dump(self.summary(), file, indent=2, default=str)
@@ -0,0 +1,188 @@
+"""
+Per-stage timing and profiling of batch runs.
+
+Stages of the pipeline are wrapped in ``stage(name, item)``, which does
+nothing unless a RunProfiler is active. While one is, every stage records
+its wall time, CPU time and, with ``trace_memory``, peak traced memory
+(tracemalloc), labelled with the file or pair it worked on:
+
+    with RunProfiler(cprofile_stages=['gamma'], trace_memory=True) as profiler:
+        engine.run_batch(reference, measurement, "report.pdf")
+    print(profiler.format_summary())
+    profiler.write("timings.json")  # or .csv; also timings.gamma.prof
+
+Stages nest: a stage's time includes the stages run inside it (e.g. parse
+includes normalize for files prepared on load). Pairs evaluated in worker
+processes are timed there and their records merged into the profiler;
+cProfile statistics cover the main process only.
+"""
+
+import cProfile
+import csv
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Stages recorded by the engine, in pipeline order
+STAGES = ('parse', 'normalize', 'match', 'cache', 'gamma', 'render', 'checkpoint', 'merge')
+
+RECORD_FIELDS = ('stage', 'item', 'count', 'wall_s', 'cpu_s', 'peak_bytes', 'pid')
+
+# The RunProfiler receiving stage records, if any
+_active = None
+
+
+def stage(name, item=None, count=1):
+    """Context manager timing one stage; a no-op without an active RunProfiler.
+
+    ``item`` labels what the stage worked on (a file or a pair), ``count`` is
+    the number of pairs it covered when it handled several at once.
+    """
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name, item, count)
+
+
+def active_profiler():
+    """The active RunProfiler, or None."""
+    return _active
+
+
+def pair_label(measure_number, reference_number):
+    return f"{measure_number:g}/{reference_number:g}"
+
+
+class RunProfiler:
+    """Collects stage records while active (``with profiler:``).
+
+    With ``trace_memory``, tracemalloc is started on entry (unless already
+    running) and each stage records its peak memory above the level it
+    started at. Tracing makes allocation-heavy stages several times slower
+    (rendering in particular), so take timings from an untraced run.
+    ``cprofile_stages`` names the stages whose function-level statistics are
+    collected with cProfile.
+    """
+
+    def __init__(self, cprofile_stages=(), trace_memory=False):
+        unknown = set(cprofile_stages) - set(STAGES)
+        if unknown:
+            raise Exception(f"Unknown stages {sorted(unknown)} (expected some of {STAGES})")
+        self.records = []
+        self.trace_memory = trace_memory
+        self.cprofiles = {name: cProfile.Profile() for name in cprofile_stages}
+        self._profiling = False  # only one cProfile.Profile can run at a time
+        self._peaks = []  # running peak of every open stage, innermost last
+        self._started_tracing = False
+        self._previous = None
+
+    def __enter__(self):
+        global _active
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous, _active = _active, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name, item=None, count=1):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+
+        profile = None
+        if name in self.cprofiles and not self._profiling:
+            profile = self.cprofiles[name]
+            self._profiling = True
+            profile.enable()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+
+            peak_bytes = None
+            if tracing:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                peak_bytes = peak - current
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+
+            self.records.append({
+                'stage': name, 'item': item, 'count': count,
+                'wall_s': wall, 'cpu_s': cpu, 'peak_bytes': peak_bytes,
+                'pid': os.getpid(),
+            })
+
+    def add_records(self, records):
+        """Merge records collected by another profiler (e.g. in a worker process)."""
+        self.records.extend(records)
+
+    def summary(self):
+        """Totals per stage: {stage: {calls, count, wall_s, cpu_s, peak_bytes}}."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {
+                'calls': 0, 'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_bytes': None
+            })
+            total['calls'] += 1
+            total['count'] += record['count']
+            total['wall_s'] += record['wall_s']
+            total['cpu_s'] += record['cpu_s']
+            if record['peak_bytes'] is not None:
+                total['peak_bytes'] = max(total['peak_bytes'] or 0, record['peak_bytes'])
+        order = {name: i for i, name in enumerate(STAGES)}
+        return dict(sorted(totals.items(), key=lambda item: order.get(item[0], len(order))))
+
+    def format_summary(self):
+        """Plain-text table of the per-stage totals."""
+        lines = [f"{'Stage':<11}  {'Calls':>5}  {'Wall (s)':>9}  {'CPU (s)':>9}  "
+                 f"{'Peak (MB)':>9}",
+                 f"{'-'*11}  {'-'*5}  {'-'*9}  {'-'*9}  {'-'*9}"]
+        for name, total in self.summary().items():
+            peak = '-' if total['peak_bytes'] is None else f"{total['peak_bytes'] / 2**20:.1f}"
+            lines.append(f"{name:<11}  {total['calls']:>5}  {total['wall_s']:>9.3f}  "
+                         f"{total['cpu_s']:>9.3f}  {peak:>9}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Write the records to ``path`` (.csv, otherwise JSON with the summary).
+
+        cProfile statistics of each profiled stage go next to it as
+        ``<path stem>.<stage>.prof`` (readable with pstats or snakeviz).
+        Returns the paths written.
+        """
+        path = os.fspath(path)
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=RECORD_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(path, 'w') as file:
+                json.dump({'summary': self.summary(), 'records': self.records}, file, indent=2)
+
+        written = [path]
+        stem = os.path.splitext(path)[0]
+        for name, profile in self.cprofiles.items():
+            if profile.getstats():
+                profile.dump_stats(f"{stem}.{name}.prof")
+                written.append(f"{stem}.{name}.prof")
+        return written
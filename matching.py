@@ -0,0 +1,104 @@
+"""
+Indexed matching of measurement scans to reference scans.
+
+References are bucketed by (scan type, beam type, energy, field size,
+orientation); inside a bucket they are sorted by start depth so the nearest
+depth is found by binary search instead of comparing every pair of headers.
+"""
+
+import numpy as np
+
+# Maximum start-depth difference (mm) for two scans to be compared
+DEPTH_TOLERANCE_MM = 10
+
+
+def _orientations(header):
+    """Orientation keys of a scan: 'x' when it starts on x = 0, 'y' on y = 0.
+
+    A scan on both axes (e.g. a depth dose) belongs to both.
+    """
+    keys = []
+    if header.start_x == 0:
+        keys.append('x')
+    if header.start_y == 0:
+        keys.append('y')
+    return keys
+
+
+def _bucket_key(header, orientation):
+    return (header.scan_type, header.beam_type, header.energy,
+            header.field_size_x, orientation)
+
+
+class ReferenceIndex:
+    """Lookup structure over reference scan headers."""
+
+    def __init__(self, reference_headers, depth_tolerance=DEPTH_TOLERANCE_MM):
+        self.depth_tolerance = depth_tolerance
+
+        buckets = {}
+        for position, header in enumerate(reference_headers):
+            for orientation in _orientations(header):
+                buckets.setdefault(_bucket_key(header, orientation), []).append(
+                    (header.start_z, position, header)
+                )
+
+        # Per bucket: sorted depths and the headers in the same order
+        self.buckets = {}
+        for key, entries in buckets.items():
+            entries.sort(key=lambda entry: (entry[0], entry[1]))
+            self.buckets[key] = (
+                np.array([entry[0] for entry in entries]),
+                [(entry[1], entry[2]) for entry in entries]
+            )
+
+    def candidates(self, header):
+        """All references within the depth tolerance, as (distance, position, header)."""
+        found = {}
+        for orientation in _orientations(header):
+            bucket = self.buckets.get(_bucket_key(header, orientation))
+            if bucket is None:
+                continue
+            depths, entries = bucket
+            lo = np.searchsorted(depths, header.start_z - self.depth_tolerance, side='right')
+            hi = np.searchsorted(depths, header.start_z + self.depth_tolerance, side='left')
+            for depth, (position, reference) in zip(depths[lo:hi], entries[lo:hi]):
+                found[position] = (abs(depth - header.start_z), position, reference)
+        return sorted(found.values(), key=lambda candidate: candidate[:2])
+
+    def match(self, header):
+        """Return (reference, tied) for a measurement header.
+
+        ``reference`` is the nearest-depth candidate (earliest in the file on a
+        tie) or None; ``tied`` lists the other candidates at the same depth.
+        """
+        candidates = self.candidates(header)
+        if not candidates:
+            return None, []
+        best_distance = candidates[0][0]
+        tied = [c[2] for c in candidates[1:] if c[0] == best_distance]
+        return candidates[0][2], tied
+
+
+def find_matches(measurement_headers, reference_headers,
+                 depth_tolerance=DEPTH_TOLERANCE_MM):
+    """Pair each measurement with its nearest-depth reference.
+
+    Returns (matches, ambiguous): matches is a list of
+    [measurement number, reference number]; ambiguous lists
+    (measurement number, [reference numbers]) where several references were
+    equally close and the first was used.
+    """
+    index = ReferenceIndex(reference_headers, depth_tolerance)
+    matches = []
+    ambiguous = []
+
+    for measure in measurement_headers:
+        reference, tied = index.match(measure)
+        if reference is None:
+            continue
+        matches.append([measure.number, reference.number])
+        if tied:
+            ambiguous.append((measure.number, [reference.number] + [t.number for t in tied]))
+
+    return matches, ambiguous
@@ -0,0 +1,197 @@
+"""
+Vectorized profile preparation.
+
+Before gamma analysis every scan is sorted by position, trimmed of its first
+and last point, classified as an inline or crossline scan and normalised.
+prepare_profiles does this for all scans of a file in a handful of
+whole-array NumPy operations, using a scan id per point instead of a Python
+loop over scans.
+
+Normalization modes (the dose every profile is divided by):
+
+    'cax'               mean dose within ±1 mm of the beam axis (the original)
+    'max'               maximum dose of the scan
+    'interpolated_cax'  dose interpolated at position 0 along the scan axis,
+                        for scans with no point within ±1 mm of the axis
+    'field_centre'      dose interpolated at the centre of the field, halfway
+                        between the 50% edges; for off-axis or asymmetric scans
+
+The factors of every mode are computed once when the profiles are prepared;
+the normalised dose of a mode is built on first use and kept.
+"""
+
+import numpy as np
+
+INLINE = "Inline"
+CROSSLINE = "Crossline"
+
+NORMALIZATION_MODES = ('cax', 'max', 'interpolated_cax', 'field_centre')
+DEFAULT_NORMALIZATION = 'cax'
+
+# Points within this distance (mm) of the beam axis in x and y define the
+# central axis dose
+CAX_HALF_WIDTH = 1
+
+
+class ProfileSet:
+    """Prepared profiles of many scans, packed like ScanSet.points.
+
+    Profile ``i`` owns elements ``offsets[i]:offsets[i + 1]`` of ``x``, ``y``
+    and ``dose`` (not normalised); ``directions[i]`` is INLINE, CROSSLINE or
+    None when the scan runs along neither axis. ``factors[mode][i]`` is the
+    normalization dose of profile ``i`` for each mode.
+    """
+
+    def __init__(self, x, y, dose, offsets, directions, factors):
+        self.x = x
+        self.y = y
+        self.dose = dose
+        self.offsets = offsets
+        self.directions = directions
+        self.factors = factors
+        self._normalized = {}  # mode -> normalised dose of all profiles
+
+    def __len__(self):
+        return len(self.directions)
+
+    def normalized_dose(self, normalization=DEFAULT_NORMALIZATION):
+        """Normalised dose of all profiles for one mode."""
+        if normalization not in self.factors:
+            raise Exception(f"Unknown normalization mode '{normalization}' "
+                            f"(expected one of {NORMALIZATION_MODES})")
+        if normalization not in self._normalized:
+            lengths = np.diff(self.offsets)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._normalized[normalization] = (
+                    self.dose / np.repeat(self.factors[normalization], lengths)
+                )
+        return self._normalized[normalization]
+
+    def profile(self, i, normalization=DEFAULT_NORMALIZATION):
+        """Return (direction, x, y, normalised dose) of profile ``i`` as views."""
+        rows = slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+        return (self.directions[i], self.x[rows], self.y[rows],
+                self.normalized_dose(normalization)[rows])
+
+
+def _interpolate(position, dose, offsets, queries):
+    """Dose of each scan at one query position along its (sorted) scan axis.
+
+    Scans are moved to disjoint intervals so one np.interp serves them all;
+    queries outside a scan, and empty scans, give NaN.
+    """
+    lengths = np.diff(offsets)
+    result = np.full(len(lengths), np.nan)
+    valid = (lengths > 0) & ~np.isnan(queries)
+    if not valid.any():
+        return result
+
+    low = position[offsets[:-1][valid]]
+    high = position[offsets[1:][valid] - 1]
+    shift = np.arange(len(low)) * (np.max(high - low) + 1.0) - low
+    rows = np.repeat(valid, lengths)
+    flat_position = position[rows] + np.repeat(shift, lengths[valid])
+
+    values = np.interp(queries[valid] + shift, flat_position, dose[rows])
+    inside = (queries[valid] >= low) & (queries[valid] <= high)
+    result[valid] = np.where(inside, values, np.nan)
+    return result
+
+
+def _half_max_edges(position, dose, starts, ends, maxima):
+    """Positions of the left and right 50% crossings of every scan."""
+    half = maxima / 2
+    lengths = ends - starts
+    scan_id = np.repeat(np.arange(len(starts)), lengths)
+    above = np.flatnonzero(dose >= half[scan_id])
+
+    left = np.full(len(starts), np.nan)
+    right = np.full(len(starts), np.nan)
+    has_above = np.searchsorted(above, ends) > np.searchsorted(above, starts)
+    first = above[np.searchsorted(above, starts[has_above])]
+    last = above[np.searchsorted(above, ends[has_above]) - 1]
+    scans = np.flatnonzero(has_above)
+
+    def crossing(inner, outer, target):
+        # Linear interpolation between a point above and a point below half max
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = (target - dose[inner]) / (dose[outer] - dose[inner])
+        return position[inner] + fraction * (position[outer] - position[inner])
+
+    # An edge needs a point below half max outside the first/last point above
+    has_left = first > starts[has_above]
+    left[scans[has_left]] = crossing(first[has_left], first[has_left] - 1,
+                                     half[scans[has_left]])
+    has_right = last < ends[has_above] - 1
+    right[scans[has_right]] = crossing(last[has_right], last[has_right] + 1,
+                                       half[scans[has_right]])
+    return left, right
+
+
+def prepare_profiles(xpos, ypos, dose, offsets):
+    """Prepare every scan of packed x, y and dose columns split at ``offsets``."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_scans = len(offsets) - 1
+    lengths = np.diff(offsets)
+    starts, ends = offsets[:-1], offsets[1:]
+    scan_id = np.repeat(np.arange(num_scans), lengths)
+
+    # Central axis dose of every scan
+    center = ((xpos > -CAX_HALF_WIDTH) & (xpos < CAX_HALF_WIDTH) &
+              (ypos > -CAX_HALF_WIDTH) & (ypos < CAX_HALF_WIDTH))
+    center_sum = np.bincount(scan_id, weights=np.where(center, dose, 0), minlength=num_scans)
+    center_count = np.bincount(scan_id, weights=center, minlength=num_scans)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cax_dose = center_sum / center_count  # NaN without central axis points
+
+    # Sort each scan by (x, y); exports are usually already in order, in which
+    # case the stable sort would be the identity and is skipped
+    same_scan = scan_id[1:] == scan_id[:-1]
+    dx = np.diff(xpos)
+    in_order = (dx > 0) | ((dx == 0) & (np.diff(ypos) >= 0)) | ~same_scan
+    if not in_order.all():
+        order = np.lexsort((ypos, xpos, scan_id))
+        xpos, ypos, dose = xpos[order], ypos[order], dose[order]
+    xpos = np.ascontiguousarray(xpos, dtype=np.float64)
+    ypos = np.ascontiguousarray(ypos, dtype=np.float64)
+    dose = np.ascontiguousarray(dose, dtype=np.float64)
+
+    # A scan is inline when x does not change between its first and middle
+    # point after trimming, crossline when y does not
+    directions = [None] * num_scans
+    trimmed = np.maximum(lengths - 2, 0)
+    has_points = trimmed > 0
+    first = starts[has_points] + 1
+    middle = first + trimmed[has_points] // 2
+    inline = xpos[middle] == xpos[first]
+    crossline = ~inline & (ypos[middle] == ypos[first])
+    for i, is_inline, is_crossline in zip(np.flatnonzero(has_points), inline, crossline):
+        directions[i] = INLINE if is_inline else CROSSLINE if is_crossline else None
+
+    # Position along the scan axis (y for inline scans, x otherwise), which
+    # the sort leaves increasing within every scan
+    is_inline = np.array([direction == INLINE for direction in directions], dtype=bool)
+    position = np.where(np.repeat(is_inline, lengths), ypos, xpos)
+
+    maxima = np.full(num_scans, np.nan)
+    nonempty = lengths > 0
+    maxima[nonempty] = np.maximum.reduceat(dose, starts[nonempty])
+
+    left, right = _half_max_edges(position, dose, starts, ends, maxima)
+    factors = {
+        'cax': cax_dose,
+        'max': maxima,
+        'interpolated_cax': _interpolate(position, dose, offsets, np.zeros(num_scans)),
+        'field_centre': _interpolate(position, dose, offsets, (left + right) / 2),
+    }
+
+    # Drop the first and last point of every scan
+    in_scan = np.arange(len(dose)) - np.repeat(starts, lengths)
+    keep = (in_scan > 0) & (in_scan < np.repeat(lengths, lengths) - 1)
+    new_offsets = np.zeros(num_scans + 1, dtype=np.int64)
+    np.cumsum(trimmed, out=new_offsets[1:])
+
+    profiles = ProfileSet(xpos[keep], ypos[keep], dose[keep], new_offsets, directions,
+                          factors)
+    profiles.normalized_dose(DEFAULT_NORMALIZATION)
+    return profiles
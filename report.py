@@ -0,0 +1,256 @@
+"""
+Gamma analysis report pages.
+
+ReportTemplate builds the page layout (figure, grid, axes, legend, metadata
+table) once per gamma configuration and, for each pair, only updates the
+line data, histogram bar heights and text strings before saving. This skips
+the figure construction, tight_layout and tight bounding-box pass that
+dominate the cost of building every page from scratch.
+
+render_page_fresh is the original build-everything-per-page renderer, kept
+as a reference for comparison and benchmarks (benchmarks/bench_render.py).
+
+matplotlib is imported on first use.
+"""
+
+import numpy as np
+
+from engine import DEFAULT_GAMMA_CONFIG, PASS_THRESHOLD
+
+# Metadata table rows: label and the value formatter for one header
+METADATA_ROWS = [
+    ("Measurement date:", lambda header, direction: header.date),
+    ("Measurement time:", lambda header, direction: header.time),
+    ("Measurement type:", lambda header, direction: header.scan_type),
+    ("Scan direction:", lambda header, direction: direction),
+    ("Beam type:", lambda header, direction: header.beam_type),
+    ("Beam Energy (MV):", lambda header, direction: f"{header.energy:.1f}"),
+    ("Field size (mm):", lambda header, direction: f"{header.field_size_x:.0f}"),
+    ("Depth (mm):", lambda header, direction: f"{header.start_z:.0f}"),
+]
+
+# Table layout in axes coordinates
+Y_START = 0.92
+Y_STEP = 0.08
+COL1_X = 0.01
+COL2_X = 0.42
+COL3_X = 0.65
+
+
+def pass_color(pass_ratio):
+    return 'green' if pass_ratio >= PASS_THRESHOLD else 'orange' if pass_ratio >= 0.90 else 'red'
+
+
+def histogram_bins(gamma_config):
+    num_bins = gamma_config['interp_fraction'] * gamma_config['max_gamma']
+    return np.linspace(0, gamma_config['max_gamma'], int(num_bins) + 1)
+
+
+def gamma_label(gamma_config):
+    return (f"Gamma ({gamma_config['dose_percent_threshold']}%/"
+            f"{gamma_config['distance_mm_threshold']}mm)")
+
+
+class ReportTemplate:
+    """A report page laid out once and refilled for every result."""
+
+    def __init__(self, gamma_config=None):
+        from matplotlib.figure import Figure
+        from matplotlib.gridspec import GridSpec
+
+        if gamma_config is None:
+            gamma_config = DEFAULT_GAMMA_CONFIG
+        self.gamma_config = dict(gamma_config)
+
+        # A bare Figure (not pyplot) is never registered with a GUI backend
+        # and is not closed between pages
+        fig = Figure(figsize=(8, 6), dpi=120, facecolor='w', edgecolor='k')
+        self.title = fig.suptitle('', fontsize=14, fontweight='bold')
+        gs = GridSpec(2, 2, figure=fig, wspace=.25, hspace=.35)
+
+        # Top panel - metadata
+        ax_top = fig.add_subplot(gs[0, :])
+        ax_top.axis('off')
+        ax_top.text(COL2_X, Y_START, 'Reference', fontweight='bold', fontsize=11)
+        ax_top.text(COL3_X, Y_START, 'Measurement', fontweight='bold', fontsize=11)
+
+        self.ref_texts = []
+        self.mes_texts = []
+        for i, (label, _) in enumerate(METADATA_ROWS):
+            y_pos = Y_START - (i + 1) * Y_STEP
+            ax_top.text(COL1_X, y_pos, label, fontweight='bold')
+            self.ref_texts.append(ax_top.text(COL2_X, y_pos, ''))
+            self.mes_texts.append(ax_top.text(COL3_X, y_pos, ''))
+
+        y_pos = Y_START - (len(METADATA_ROWS) + 2) * Y_STEP
+        ax_top.text(COL1_X, y_pos, "Pass rate:", fontweight='bold', fontsize=11)
+        self.pass_text = ax_top.text(COL2_X, y_pos, '', fontweight='bold', fontsize=11)
+
+        # Dose profile plot
+        ax_dose = fig.add_subplot(gs[1, :-1])
+        ax_dose.tick_params(direction='in', labelsize=9)
+        ax_dose.tick_params(axis='x', bottom=True, top=True, labeltop=True)
+        ax_dose.minorticks_on()
+        ax_dose.set_xlabel('Position (mm)', fontsize=10)
+        ax_dose.set_ylabel('Dose (Gy/MU)', fontsize=10, labelpad=15)
+
+        # Gamma plot (twin axis)
+        ax_gamma = ax_dose.twinx()
+        ax_gamma.minorticks_on()
+        ax_gamma.tick_params(labelsize=9)
+        ax_gamma.set_ylabel('Gamma Index', fontsize=10, labelpad=15)
+        ax_gamma.set_ylim([0, gamma_config['max_gamma'] * 2.0])
+
+        self.curve_ref, = ax_dose.plot([], [], 'k-', label='Reference dose', linewidth=1.5)
+        self.curve_eval, = ax_dose.plot([], [], 'bo', mfc='none', markersize=4,
+                                        label='Evaluation dose')
+        self.curve_gamma, = ax_gamma.plot([], [], 'r*', markersize=3,
+                                          label=gamma_label(gamma_config))
+
+        curves = [self.curve_ref, self.curve_eval, self.curve_gamma]
+        ax_dose.legend(curves, [c.get_label() for c in curves], loc='upper right', fontsize=9)
+        ax_dose.grid(True, alpha=0.3)
+
+        # Histogram: one bar per bin, heights filled in per page
+        ax_hist = fig.add_subplot(gs[1:, -1])
+        self.bins = histogram_bins(gamma_config)
+        self.bars = ax_hist.bar(self.bins[:-1], np.zeros(len(self.bins) - 1),
+                                width=np.diff(self.bins), align='edge',
+                                color='skyblue', edgecolor='black')
+        ax_hist.set_xlim([0, gamma_config['max_gamma']])
+        ax_hist.set_xlabel('Gamma Index', fontsize=10)
+        ax_hist.set_ylabel('Probability Density', fontsize=10)
+        ax_hist.axvline(x=1, color='red', linestyle='--', linewidth=2, label='Pass threshold')
+        ax_hist.legend(fontsize=8)
+
+        self.fig = fig
+        self.ax_dose = ax_dose
+        self.ax_hist = ax_hist
+        self._laid_out = False
+
+    def update(self, result):
+        """Fill the page with one GammaResult."""
+        self.title.set_text(
+            f'Gamma Analysis: {result.ref_header.beam_type} {result.ref_header.energy}MV'
+        )
+        for (_, value), ref_text, mes_text in zip(METADATA_ROWS, self.ref_texts,
+                                                  self.mes_texts):
+            ref_text.set_text(value(result.ref_header, result.direction))
+            mes_text.set_text(value(result.mes_header, result.direction))
+
+        self.pass_text.set_text(f"{result.pass_ratio * 100:.2f}%")
+        self.pass_text.set_color(pass_color(result.pass_ratio))
+
+        self.curve_ref.set_data(result.axis_reference, result.dose_reference)
+        self.curve_eval.set_data(result.axis_evaluation, result.dose_evaluation)
+        self.curve_gamma.set_data(result.axis_reference, result.gamma)
+        self.ax_dose.relim()
+        self.ax_dose.autoscale_view(scaley=False)
+        max_dose = max(np.max(result.dose_reference), np.max(result.dose_evaluation))
+        self.ax_dose.set_ylim([0, max_dose * 1.1])
+
+        valid_gamma = result.gamma[~np.isnan(result.gamma)]
+        heights, _ = np.histogram(valid_gamma, self.bins, density=True)
+        for bar, height in zip(self.bars, heights):
+            bar.set_height(height)
+        self.ax_hist.relim()
+        self.ax_hist.autoscale_view(scalex=False)
+
+    def render(self, result, pdf_pages):
+        """Add the report page for one result to an open PdfPages."""
+        self.update(result)
+        if not self._laid_out:
+            # Layout once, with the first page's text and tick labels in place
+            self.fig.tight_layout(rect=[0, 0, 1, 0.96])  # Leave room for the title
+            # tight_layout leaves a placeholder layout engine behind, which makes
+            # every savefig draw the figure twice; the positions are fixed now
+            self.fig.set_layout_engine(None)
+            self._laid_out = True
+        pdf_pages.savefig(self.fig)
+
+
+def render_page_fresh(result, pdf_pages, gamma_config=None):
+    """Build, lay out and save a new figure for one result (original renderer)."""
+    import matplotlib.pyplot as plt
+    from matplotlib.gridspec import GridSpec
+
+    if gamma_config is None:
+        gamma_config = DEFAULT_GAMMA_CONFIG
+
+    pass_ratio = result.pass_ratio
+    valid_gamma = result.gamma[~np.isnan(result.gamma)]
+
+    # Create figure
+    fig = plt.figure(figsize=(8, 6), dpi=120, facecolor='w', edgecolor='k')
+    fig.suptitle(
+        f'Gamma Analysis: {result.ref_header.beam_type} {result.ref_header.energy}MV',
+        fontsize=14, fontweight='bold'
+    )
+    gs = GridSpec(2, 2, figure=fig, wspace=.25, hspace=.35)
+
+    # Top panel - metadata
+    ax_top = fig.add_subplot(gs[0, :])
+    ax_top.axis('off')
+
+    # Column headers
+    ax_top.text(COL2_X, Y_START, 'Reference', fontweight='bold', fontsize=11)
+    ax_top.text(COL3_X, Y_START, 'Measurement', fontweight='bold', fontsize=11)
+
+    # Metadata rows
+    for i, (label, value) in enumerate(METADATA_ROWS):
+        y_pos = Y_START - (i + 1) * Y_STEP
+        ax_top.text(COL1_X, y_pos, label, fontweight='bold')
+        ax_top.text(COL2_X, y_pos, value(result.ref_header, result.direction))
+        ax_top.text(COL3_X, y_pos, value(result.mes_header, result.direction))
+
+    # Pass rate
+    y_pos = Y_START - (len(METADATA_ROWS) + 2) * Y_STEP
+    ax_top.text(COL1_X, y_pos, "Pass rate:", fontweight='bold', fontsize=11)
+    ax_top.text(COL2_X, y_pos, f"{pass_ratio * 100:.2f}%",
+                fontweight='bold', fontsize=11, color=pass_color(pass_ratio))
+
+    # Dose profile plot
+    ax_dose = fig.add_subplot(gs[1, :-1])
+    ax_dose.tick_params(direction='in', labelsize=9)
+    ax_dose.tick_params(axis='x', bottom=True, top=True, labeltop=True)
+    ax_dose.minorticks_on()
+    ax_dose.set_xlabel('Position (mm)', fontsize=10)
+    ax_dose.set_ylabel('Dose (Gy/MU)', fontsize=10, labelpad=15)
+
+    max_dose = max(np.max(result.dose_reference), np.max(result.dose_evaluation))
+    ax_dose.set_ylim([0, max_dose * 1.1])
+
+    # Gamma plot (twin axis)
+    ax_gamma = ax_dose.twinx()
+    ax_gamma.minorticks_on()
+    ax_gamma.tick_params(labelsize=9)
+    ax_gamma.set_ylabel('Gamma Index', fontsize=10, labelpad=15)
+    ax_gamma.set_ylim([0, gamma_config['max_gamma'] * 2.0])
+
+    # Plot curves
+    curve_ref = ax_dose.plot(result.axis_reference, result.dose_reference, 'k-',
+                             label='Reference dose', linewidth=1.5)
+    curve_eval = ax_dose.plot(result.axis_evaluation, result.dose_evaluation, 'bo',
+                              mfc='none', markersize=4, label='Evaluation dose')
+    curve_gamma = ax_gamma.plot(result.axis_reference, result.gamma, 'r*', markersize=3,
+                                label=gamma_label(gamma_config))
+
+    curves = curve_ref + curve_eval + curve_gamma
+    labels_list = [l.get_label() for l in curves]
+    ax_dose.legend(curves, labels_list, loc='upper right', fontsize=9)
+    ax_dose.grid(True, alpha=0.3)
+
+    # Histogram
+    ax_hist = fig.add_subplot(gs[1:, -1])
+    ax_hist.hist(valid_gamma, histogram_bins(gamma_config), density=True,
+                 color='skyblue', edgecolor='black')
+    ax_hist.set_xlim([0, gamma_config['max_gamma']])
+    ax_hist.set_xlabel('Gamma Index', fontsize=10)
+    ax_hist.set_ylabel('Probability Density', fontsize=10)
+    ax_hist.axvline(x=1, color='red', linestyle='--', linewidth=2, label='Pass threshold')
+    ax_hist.legend(fontsize=8)
+
+    # Save to PDF
+    fig.tight_layout(rect=[0, 0, 1, 0.96])  # Adjust layout, leaving room for title
+    pdf_pages.savefig(fig, bbox_inches='tight')
+    plt.close(fig)
@@ -0,0 +1,319 @@
+"""
+Persistent SQLite store of parsed scans and gamma results.
+
+A file is parsed once when it is ingested: every scan's header becomes a
+row of the ``scans`` table and its points a float64 blob next to it.
+Loading an ingested file builds its ScanSet from the database; the source is
+only parsed again when its size and modification time changed and its
+SHA-256 no longer matches. Scans are indexed on beam type, energy, field
+size and depth (the lookup of candidates() and of queries for one beam), on
+depth alone and on measurement date, so scans of any ingested file (e.g.
+every reference of a beam across years of baselines) are found with one
+indexed query:
+
+    with ScanDatabase("qa.sqlite") as db:
+        reference = db.load("baseline_2023.txt")
+        measurement = db.load("annual_qa.txt")
+        db.begin("baseline_2023.txt", "annual_qa.txt", gamma_config)
+        engine.run_batch(reference, measurement, "report.pdf", gamma_config, export=db)
+        db.results(beam_type="PHO", energy=6)
+
+While a run is begun, the database takes the same per-pair rows as
+export.ResultsExport and stores one result per matched pair.
+"""
+
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from ascii_parser import parse_ascii_file
+from engine import DEFAULT_GAMMA_CONFIG, PASS_THRESHOLD
+from instrumentation import stage
+from matching import DEPTH_TOLERANCE_MM
+from scan_store import ScanHeader, ScanSet, _file_hash
+
+# Bump when the tables change; an older database is rejected, not migrated
+SCHEMA_VERSION = 1
+
+HEADER_FIELDS = ScanHeader._fields
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    ingested TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    {', '.join(HEADER_FIELDS)},
+    measured TEXT,
+    points BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_by_file ON scans(file_id, position);
+CREATE INDEX IF NOT EXISTS scans_by_beam ON scans(beam_type, energy, field_size_x, start_z);
+CREATE INDEX IF NOT EXISTS scans_by_depth ON scans(start_z);
+CREATE INDEX IF NOT EXISTS scans_by_date ON scans(measured);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    reference_scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    measurement_scan_id INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    gamma_config TEXT NOT NULL,
+    direction TEXT,
+    pass_ratio REAL,
+    gamma_mean REAL,
+    gamma_max REAL,
+    points_evaluated INTEGER,
+    error TEXT,
+    created TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_reference ON results(reference_scan_id);
+CREATE INDEX IF NOT EXISTS results_by_measurement ON results(measurement_scan_id);
+"""
+
+# Query keywords of find_scans that compare one indexed column
+SCAN_FILTERS = ('scan_type', 'beam_type', 'energy', 'field_size_x', 'field_size_y', 'ssd')
+
+
+def measured_date(date):
+    """ISO date (YYYY-MM-DD) of an IBA header date (MM-DD-YYYY), or None."""
+    try:
+        month, day, year = (int(part) for part in date.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def _scan_filters(criteria, depth=None, depth_tolerance=DEPTH_TOLERANCE_MM,
+                  since=None, until=None, path=None):
+    """SQL condition and parameters of find_scans/results keyword filters."""
+    conditions, parameters = [], []
+    for field, value in criteria.items():
+        if field not in SCAN_FILTERS:
+            raise Exception(f"Unknown scan filter '{field}' (expected one of {SCAN_FILTERS})")
+        if value is not None:
+            conditions.append(f"scans.{field} = ?")
+            parameters.append(value)
+    if depth is not None:
+        conditions.append("scans.start_z BETWEEN ? AND ?")
+        parameters += [depth - depth_tolerance, depth + depth_tolerance]
+    if since is not None:
+        conditions.append("scans.measured >= ?")
+        parameters.append(since)
+    if until is not None:
+        conditions.append("scans.measured <= ?")
+        parameters.append(until)
+    if path is not None:
+        conditions.append("files.path = ?")
+        parameters.append(os.path.abspath(path))
+    return " AND ".join(conditions) or "1", parameters
+
+
+class ScanDatabase:
+    """SQLite file of ingested scans and stored gamma results."""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise Exception(f"{self.path} has schema version {version}, "
+                            f"expected {SCHEMA_VERSION}")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        self._run = None  # (reference file id, measurement file id, gamma config JSON)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def _file(self, filepath):
+        return self.connection.execute(
+            "SELECT * FROM files WHERE path = ?", (os.path.abspath(filepath),)
+        ).fetchone()
+
+    def ingest(self, filepath):
+        """Store the scans of an ASCII file unless it is already up to date.
+
+        Returns (file id, parsed): ``parsed`` is False when the stored copy
+        was still current. Re-ingesting a changed file replaces its scans and
+        drops the results that used them.
+        """
+        path = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        row = self._file(filepath)
+        if row is not None and row['size'] == stat.st_size:
+            if row['mtime_ns'] == stat.st_mtime_ns:
+                return row['id'], False
+            # Touched (copied, checked out again...) but maybe not changed
+            if _file_hash(filepath) == row['sha256']:
+                with self.connection:
+                    self.connection.execute("UPDATE files SET mtime_ns = ? WHERE id = ?",
+                                            (stat.st_mtime_ns, row['id']))
+                return row['id'], False
+
+        sha256 = _file_hash(filepath)
+        with stage('parse', item=str(filepath)):
+            headers, scans = parse_ascii_file(filepath)
+        with self.connection:
+            if row is not None:
+                self.connection.execute("DELETE FROM files WHERE id = ?", (row['id'],))
+            file_id = self.connection.execute(
+                "INSERT INTO files (path, size, mtime_ns, sha256, ingested) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256,
+                 time.strftime('%Y-%m-%dT%H:%M:%S'))
+            ).lastrowid
+            self.connection.executemany(
+                f"INSERT INTO scans (file_id, position, {', '.join(HEADER_FIELDS)}, "
+                f"measured, points) VALUES ({', '.join('?' * (len(HEADER_FIELDS) + 4))})",
+                ((file_id, position, *ScanHeader(*header), measured_date(header[1]),
+                  np.ascontiguousarray(points, dtype='<f8').tobytes())
+                 for position, (header, points) in enumerate(zip(headers, scans)))
+            )
+        return file_id, True
+
+    def load(self, filepath):
+        """ScanSet of an ASCII file, ingesting it first when needed."""
+        file_id, parsed = self.ingest(filepath)
+        with stage('parse', item=f"{filepath} (database)"):
+            rows = self.connection.execute(
+                f"SELECT {', '.join(HEADER_FIELDS)}, points FROM scans "
+                "WHERE file_id = ? ORDER BY position", (file_id,)
+            ).fetchall()
+        state = "ingested" if parsed else "loaded from database"
+        print(f"  ✓ {len(rows)} scans {state}: {os.path.basename(filepath)}")
+        return ScanSet.from_scans(
+            [tuple(row)[:-1] for row in rows],
+            [np.frombuffer(row['points'], dtype='<f8').reshape(-1, 4) for row in rows]
+        )
+
+    def files(self):
+        """Paths of the ingested files, oldest ingest first."""
+        return [row['path'] for row in
+                self.connection.execute("SELECT path FROM files ORDER BY id")]
+
+    def find_scans(self, depth=None, depth_tolerance=DEPTH_TOLERANCE_MM, since=None,
+                   until=None, path=None, **criteria):
+        """Headers of the stored scans that match every given filter.
+
+        ``criteria`` compare header fields for equality (see SCAN_FILTERS);
+        ``depth`` selects start depths within ``depth_tolerance`` mm; ``since``
+        and ``until`` bound the measurement date (YYYY-MM-DD, inclusive);
+        ``path`` limits the search to one file. Returns (file path, ScanHeader)
+        tuples ordered by date, file and position.
+        """
+        condition, parameters = _scan_filters(criteria, depth, depth_tolerance, since,
+                                               until, path)
+        rows = self.connection.execute(
+            f"SELECT files.path, {', '.join('scans.' + f for f in HEADER_FIELDS)} "
+            f"FROM scans JOIN files ON files.id = scans.file_id WHERE {condition} "
+            "ORDER BY scans.measured, files.id, scans.position", parameters
+        ).fetchall()
+        return [(row[0], ScanHeader(*tuple(row)[1:])) for row in rows]
+
+    def candidates(self, header, depth_tolerance=DEPTH_TOLERANCE_MM, path=None):
+        """Stored scans a measurement header would be matched to (see matching.py).
+
+        Same scan type, beam, energy, field size and orientation, start depth
+        within ``depth_tolerance``; nearest depth first.
+        """
+        found = self.find_scans(header.start_z, depth_tolerance, path=path,
+                                scan_type=header.scan_type, beam_type=header.beam_type,
+                                energy=header.energy, field_size_x=header.field_size_x)
+        on_axis = [(header.start_x == 0, 'start_x'), (header.start_y == 0, 'start_y')]
+        found = [(filepath, reference) for filepath, reference in found
+                 if any(wanted and getattr(reference, field) == 0
+                        for wanted, field in on_axis)]
+        return sorted(found, key=lambda entry: abs(entry[1].start_z - header.start_z))
+
+    def begin(self, reference_file, measurement_file, gamma_config=None):
+        """Store the pairs of the next run_batch (``export=db``) under these files.
+
+        Both files must have been ingested.
+        """
+        ids = []
+        for filepath in (reference_file, measurement_file):
+            row = self._file(filepath)
+            if row is None:
+                raise Exception(f"{filepath} is not in {self.path}; load or ingest it first")
+            ids.append(row['id'])
+        config = DEFAULT_GAMMA_CONFIG if gamma_config is None else gamma_config
+        self.connection.commit()
+        self._run = (*ids, json.dumps(config, sort_keys=True))
+
+    def _scan_id(self, file_id, number):
+        row = self.connection.execute(
+            "SELECT id FROM scans WHERE file_id = ? AND number = ? ORDER BY position LIMIT 1",
+            (file_id, number)
+        ).fetchone()
+        return row['id']
+
+    def add(self, measure_num, ref_num, ref_header, mes_header, summary, error):
+        """Store the result of one pair (same arguments as ResultsExport.add)."""
+        if self._run is None:
+            raise Exception("ScanDatabase.begin() must be called before adding results")
+        reference_id, measurement_id, config = self._run
+        summary = summary or {}
+        self.connection.execute(
+            "INSERT INTO results (reference_scan_id, measurement_scan_id, gamma_config, "
+            "direction, pass_ratio, gamma_mean, gamma_max, points_evaluated, error, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._scan_id(reference_id, ref_num), self._scan_id(measurement_id, measure_num),
+             config, summary.get('direction'), summary.get('pass_ratio'),
+             summary.get('gamma_mean'), summary.get('gamma_max'),
+             summary.get('points_evaluated'), error, time.strftime('%Y-%m-%dT%H:%M:%S'))
+        )
+
+    def results(self, depth=None, depth_tolerance=DEPTH_TOLERANCE_MM, since=None,
+                until=None, measurement_file=None, reference_file=None,
+                threshold=PASS_THRESHOLD, **criteria):
+        """Stored results whose measurement scan matches the filters of find_scans.
+
+        Returns dicts with both files and scan numbers, the measurement header
+        fields, the stored statistics and ``passed``, oldest measurement first.
+        """
+        condition, parameters = _scan_filters(criteria, depth, depth_tolerance, since,
+                                              until, measurement_file)
+        if reference_file is not None:
+            condition += " AND reference_files.path = ?"
+            parameters.append(os.path.abspath(reference_file))
+        rows = self.connection.execute(
+            "SELECT files.path AS measurement_file, reference_files.path AS reference_file, "
+            "scans.number AS measurement, reference_scans.number AS reference, "
+            f"{', '.join('scans.' + f for f in HEADER_FIELDS[1:])}, scans.measured, "
+            "results.direction, results.pass_ratio, results.gamma_mean, results.gamma_max, "
+            "results.points_evaluated, results.error, results.gamma_config, results.created "
+            "FROM results "
+            "JOIN scans ON scans.id = results.measurement_scan_id "
+            "JOIN files ON files.id = scans.file_id "
+            "JOIN scans AS reference_scans ON reference_scans.id = results.reference_scan_id "
+            "JOIN files AS reference_files ON reference_files.id = reference_scans.file_id "
+            f"WHERE {condition} ORDER BY scans.measured, results.id", parameters
+        ).fetchall()
+        records = []
+        for row in rows:
+            record = dict(row)
+            record['gamma_config'] = json.loads(record['gamma_config'])
+            record['passed'] = (record['error'] is None and record['pass_ratio'] is not None
+                                and record['pass_ratio'] >= threshold)
+            records.append(record)
+        return records
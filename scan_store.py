@@ -0,0 +1,260 @@
+"""
+Columnar storage for parsed scans.
+
+Each measurement keeps one small header record, and the data points of all
+measurements share one contiguous (N, 4) float64 array of x, y, z and dose.
+
+ScanCatalog is the lazy alternative to ScanSet: it indexes a file on open and
+reads each scan's points only when they are first used.
+
+load_scan_set(filepath, cache_dir) keeps a binary copy of every parsed file
+in cache_dir: the points as a .npy file (loaded memory-mapped) and headers
+and offsets as JSON. The copy is used while the source file's size and
+modification time are unchanged, or its SHA-256 still matches, so an
+unchanged reference library loads without being reparsed.
+"""
+
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from ascii_parser import MappedAsciiFile, parse_ascii_file, read_block_scan
+from instrumentation import stage
+from profiles import DEFAULT_NORMALIZATION, prepare_profiles
+
+# Column positions in ScanSet.points
+X, Y, Z, DOSE = range(4)
+
+# Bump when the parser or the cache layout changes
+SCAN_CACHE_VERSION = 1
+
+# Per-user cache of parsed files, used by the GUI for reference files
+DEFAULT_SCAN_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                                      '1dBatchScanCompare', 'scans')
+
+
+class ScanHeader(NamedTuple):
+    """Header record of one measurement (field order matches the legacy list)."""
+    number: float
+    date: str
+    time: str
+    scan_type: str
+    beam_type: str
+    energy: float
+    field_size_x: float
+    field_size_y: float
+    ssd: float
+    start_x: float
+    start_y: float
+    start_z: float
+    stop_z: float
+
+
+class ScanSet:
+    """All scans of one ASCII file.
+
+    Scan ``i`` owns rows ``offsets[i]:offsets[i + 1]`` of ``points``. The
+    prepared profiles (see profiles.py) of all scans are computed on load.
+    """
+
+    def __init__(self, headers, points, offsets):
+        self.headers = list(headers)
+        self.points = points
+        self.offsets = offsets
+        with stage('normalize', count=len(self.headers)):
+            self.profiles = prepare_profiles(points[:, X], points[:, Y], points[:, DOSE],
+                                             offsets)
+
+        # Measurement number -> (header, row slice), built once at load time.
+        # A repeated number keeps its first scan.
+        self.index = {}
+        self._positions = {}
+        for i, header in enumerate(self.headers):
+            self.index.setdefault(
+                header.number,
+                (header, slice(int(offsets[i]), int(offsets[i + 1])))
+            )
+            self._positions.setdefault(header.number, i)
+
+    @classmethod
+    def from_scans(cls, headers, scans):
+        """Build a ScanSet from header lists and per-scan point arrays."""
+        offsets = np.zeros(len(scans) + 1, dtype=np.int64)
+        np.cumsum([len(scan) for scan in scans], out=offsets[1:])
+        points = np.concatenate(scans) if scans else np.empty((0, 4))
+        return cls([ScanHeader(*h) for h in headers], points, offsets)
+
+    def __len__(self):
+        return len(self.headers)
+
+    def scan(self, number):
+        """Return (header, points) for a measurement; points is a view."""
+        try:
+            header, rows = self.index[number]
+        except KeyError:
+            raise KeyError(f"Measurement {number} not found")
+        return header, self.points[rows]
+
+    def profile(self, number, normalization=DEFAULT_NORMALIZATION):
+        """Return (header, (direction, x, y, normalised dose)) for a measurement."""
+        header, _ = self.scan(number)
+        return header, self.profiles.profile(self._positions[number], normalization)
+
+
+class ScanCatalog:
+    """Headers of all scans in an ASCII file, with points read on first use.
+
+    Opening only indexes the file (header fields and the byte range of each
+    measurement block); scan() parses a scan's data rows the first time it is
+    asked for. Offers the same headers/len/scan interface as ScanSet.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with MappedAsciiFile(filepath) as export:
+            self.headers = [ScanHeader(*h) for h in export.headers]
+            self.blocks = export.blocks
+        stat = os.stat(filepath)
+        self._stamp = (stat.st_size, stat.st_mtime_ns)
+        self._points = {}  # block number -> points, once read
+        self._profiles = {}  # block number -> prepared ProfileSet of the scan
+
+        # Measurement number -> (header, block number); a repeated number
+        # keeps its first scan, as in ScanSet
+        self.index = {}
+        for i, header in enumerate(self.headers):
+            self.index.setdefault(header.number, (header, i))
+
+    def __len__(self):
+        return len(self.headers)
+
+    @property
+    def loaded(self):
+        """Number of scans whose points have been read."""
+        return len(self._points)
+
+    def scan(self, number):
+        """Return (header, points) for a measurement, reading it if needed."""
+        try:
+            header, block = self.index[number]
+        except KeyError:
+            raise KeyError(f"Measurement {number} not found")
+
+        if block not in self._points:
+            stat = os.stat(self.filepath)
+            if (stat.st_size, stat.st_mtime_ns) != self._stamp:
+                raise Exception(f"File changed since it was opened: {self.filepath}")
+            with stage('parse', item=f"{self.filepath}#{number:g}"):
+                self._points[block] = read_block_scan(self.filepath, self.blocks[block])
+        return header, self._points[block]
+
+    def profile(self, number, normalization=DEFAULT_NORMALIZATION):
+        """Return (header, (direction, x, y, normalised dose)) for a measurement."""
+        header, points = self.scan(number)
+        block = self.index[number][1]
+        if block not in self._profiles:
+            with stage('normalize', item=f"{self.filepath}#{number:g}"):
+                self._profiles[block] = prepare_profiles(
+                    points[:, X], points[:, Y], points[:, DOSE], [0, len(points)]
+                )
+        return header, self._profiles[block].profile(0, normalization)
+
+
+def _file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(filepath, cache_dir):
+    """(.npy, .json) cache paths of a source file, unique per absolute path."""
+    path_key = hashlib.sha256(os.path.abspath(filepath).encode()).hexdigest()[:16]
+    base = os.path.join(cache_dir, f"{os.path.basename(filepath)}.{path_key}")
+    return base + '.npy', base + '.json'
+
+
+def _write_json(path, meta):
+    with open(path + '.tmp', 'w') as file:
+        json.dump(meta, file)
+    os.replace(path + '.tmp', path)
+
+
+def read_scan_cache(filepath, cache_dir):
+    """Cached ScanSet of a source file, or None when missing or stale."""
+    points_path, meta_path = _cache_paths(filepath, cache_dir)
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+        stat = os.stat(filepath)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('version') != SCAN_CACHE_VERSION or meta['size'] != stat.st_size:
+        return None
+    if meta['mtime_ns'] != stat.st_mtime_ns:
+        # Touched (copied, checked out again...) but maybe not changed
+        if _file_hash(filepath) != meta['sha256']:
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        _write_json(meta_path, meta)
+
+    try:
+        points = np.load(points_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if points.shape != (meta['offsets'][-1], 4):
+        return None
+    return ScanSet([ScanHeader(*h) for h in meta['headers']], points,
+                   np.array(meta['offsets'], dtype=np.int64))
+
+
+def write_scan_cache(scans, filepath, cache_dir, stat, sha256):
+    """Save a parsed ScanSet; ``stat`` and ``sha256`` describe the parsed source."""
+    os.makedirs(cache_dir, exist_ok=True)
+    points_path, meta_path = _cache_paths(filepath, cache_dir)
+
+    # Points first, metadata last: a cache without its JSON is never used
+    with open(points_path + '.tmp', 'wb') as file:
+        np.save(file, np.ascontiguousarray(scans.points))
+    os.replace(points_path + '.tmp', points_path)
+    _write_json(meta_path, {
+        'version': SCAN_CACHE_VERSION,
+        'source': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'headers': [list(header) for header in scans.headers],
+        'offsets': [int(offset) for offset in scans.offsets],
+    })
+
+
+def load_scan_set(filepath, cache_dir=None):
+    """Parse an IBA ASCII file into a ScanSet.
+
+    With ``cache_dir``, an up-to-date binary copy is loaded instead of parsing,
+    and a freshly parsed file is saved there for next time.
+    """
+    if cache_dir is None:
+        headers, scans = parse_ascii_file(filepath)
+        return ScanSet.from_scans(headers, scans)
+
+    cached = read_scan_cache(filepath, cache_dir)
+    if cached is not None:
+        return cached
+
+    # Describe the source before parsing, so a change during the parse
+    # invalidates the cache rather than being hidden by it
+    stat = os.stat(filepath)
+    sha256 = _file_hash(filepath)
+    headers, scans = parse_ascii_file(filepath)
+    scan_set = ScanSet.from_scans(headers, scans)
+    try:
+        write_scan_cache(scan_set, filepath, cache_dir, stat, sha256)
+    except OSError as e:
+        print(f"Warning: could not cache {filepath}: {str(e)}")
+    return scan_set
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests of the content-addressed result cache.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import numpy as np
+import pytest
+from pypdf import PdfReader
+
+import engine
+from cache import ResultCache
+from conftest import load_scan_pair
+
+
+def count_computed(monkeypatch):
+    """Record the pairs passed to compute_gamma_batch."""
+    computed = []
+    compute_gamma_batch = engine.compute_gamma_batch
+
+    def counting(measurement_scans, reference_scans, matches, gamma_config=None):
+        computed.extend(map(tuple, matches))
+        return compute_gamma_batch(measurement_scans, reference_scans, matches, gamma_config)
+
+    monkeypatch.setattr(engine, 'compute_gamma_batch', counting)
+    return computed
+
+
+def test_repeat_run_uses_cache(tmp_path, monkeypatch, scan_pair):
+    reference, measurement = scan_pair
+    cache = ResultCache(tmp_path / "cache")
+    computed = count_computed(monkeypatch)
+
+    first = engine.run_batch(reference, measurement, tmp_path / "first.pdf", cache=cache)
+    assert len(computed) == 3
+
+    second = engine.run_batch(reference, measurement, tmp_path / "second.pdf",
+                              cache=ResultCache(tmp_path / "cache"))
+    assert len(computed) == 3  # nothing recomputed
+    assert second == first
+    assert len(PdfReader(tmp_path / "second.pdf").pages) == 3
+
+    # Changed settings miss the cache
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, dose_percent_threshold=3)
+    engine.run_batch(reference, measurement, tmp_path / "third.pdf", config, cache=cache)
+    assert len(computed) == 6
+
+
+def test_result_round_trip(tmp_path, scan_pair):
+    reference, measurement = scan_pair
+    measure_num, ref_num = engine.match_scans(measurement, reference)[0]
+    result = engine.compute_gamma(measurement, reference, measure_num, ref_num)
+
+    cache = ResultCache(tmp_path)
+    cache.put("key", result, b"%PDF page")
+    cached = ResultCache(tmp_path).get("key")
+
+    assert cached.ref_header == result.ref_header
+    assert cached.mes_header == result.mes_header
+    assert cached.direction == result.direction
+    assert cached.pass_ratio == result.pass_ratio
+    assert np.array_equal(cached.gamma, result.gamma, equal_nan=True)
+    assert ResultCache(tmp_path).get_page("key") == b"%PDF page"
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=2500)
+    for key in ("a", "b", "c"):
+        cache.put_page(key, bytes(1000))
+    assert sorted(cache.entries) == ["b", "c"]
+
+    cache.get_page("b")
+    cache.put_page("d", bytes(1000))
+    assert sorted(cache.entries) == ["b", "d"]
+    assert cache.get_page("a") is None and cache.get_page("c") is None
+
+
+if __name__ == "__main__":
+    try:
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_repeat_run_uses_cache(Path(tempfile.mkdtemp()), monkeypatch, load_scan_pair())
+        test_result_round_trip(Path(tempfile.mkdtemp()), load_scan_pair())
+        test_least_recently_used_evicted(Path(tempfile.mkdtemp()))
+        print("\n✓ Result cache tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Result cache test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests of checkpointed report output and resuming interrupted batches.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import pytest
+from pypdf import PdfReader
+
+import engine
+from checkpoint import PageCheckpoint, checkpoint_dir
+from conftest import load_scan_pair
+
+
+def test_interrupted_batch_resumes(tmp_path, monkeypatch, scan_pair):
+    reference, measurement = scan_pair
+    pdf_path = tmp_path / "report.pdf"
+    render_page = engine._render_page
+    rendered = []
+
+    def crash_on_second_page(result, gamma_config):
+        if len(rendered) == 1:
+            raise KeyboardInterrupt
+        rendered.append(result.measure_number)
+        return render_page(result, gamma_config)
+
+    monkeypatch.setattr(engine, '_render_page', crash_on_second_page)
+    with pytest.raises(KeyboardInterrupt):
+        engine.run_batch(reference, measurement, pdf_path)
+
+    assert not pdf_path.exists()
+    assert sorted(os.listdir(checkpoint_dir(pdf_path))) == ["manifest.jsonl", "page_00000.pdf"]
+
+    rendered.append(None)  # no further crashes
+    results = engine.run_batch(reference, measurement, pdf_path)
+
+    assert len(rendered) == 4  # first page was not rendered again
+    assert [r[3] for r in results] == [None, None, None]
+    assert len(PdfReader(pdf_path).pages) == 3
+    assert not os.path.exists(checkpoint_dir(pdf_path))
+
+
+def test_cancelled_batch_reports_progress_and_resumes(tmp_path, scan_pair):
+    reference, measurement = scan_pair
+    pdf_path = tmp_path / "report.pdf"
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    cancel = threading.Event()
+    reports = []
+
+    def progress(done, total):
+        reports.append((done, total))
+        if done == 1:
+            cancel.set()  # as the GUI's Cancel button would, mid-batch
+
+    results = engine.run_batch(reference, measurement, pdf_path, config,
+                               progress=progress, cancel=cancel)
+    assert reports == [(0, 3), (1, 3)]
+    assert len(results) == 1
+    assert not pdf_path.exists()
+    assert os.path.exists(checkpoint_dir(pdf_path))
+
+    reports.clear()
+    results = engine.run_batch(reference, measurement, pdf_path, config, progress=progress)
+    assert reports == [(1, 3), (2, 3), (3, 3)]
+    assert len(results) == 3
+    assert len(PdfReader(pdf_path).pages) == 3
+
+
+def test_progress_text():
+    import main
+
+    assert main.format_progress(0, 40, 0, 0.0) == "0/40 pairs"
+    # 10 resumed pairs, then 6 new ones in 3 s: 2 pairs/s, 24 left
+    assert main.format_progress(16, 40, 6, 3.0) == "16/40 pairs · 2.0 pairs/s · ETA 0:12"
+
+
+def test_checkpoint_of_other_run_is_discarded(tmp_path):
+    directory = str(tmp_path / "report.pdf.partial")
+    checkpoint = PageCheckpoint(directory, "run-a")
+    checkpoint.save(0, 0.99, None)
+
+    assert PageCheckpoint(directory, "run-a").done == {0: (0.99, None, None)}
+    assert PageCheckpoint(directory, "run-b").done == {}
+
+
+def test_torn_manifest_line_is_ignored(tmp_path):
+    directory = str(tmp_path / "report.pdf.partial")
+    checkpoint = PageCheckpoint(directory, "run")
+    checkpoint.save(0, 1.0, None)
+    with open(os.path.join(directory, "manifest.jsonl"), "a") as file:
+        file.write('{"index": 1, "pass')
+
+    resumed = PageCheckpoint(directory, "run")
+    assert resumed.done == {0: (1.0, None, None)}
+
+    # Records saved after the torn line survive the next resume
+    resumed.save(1, 0.5, None)
+    assert PageCheckpoint(directory, "run").done == {0: (1.0, None, None),
+                                                     1: (0.5, None, None)}
+
+
+if __name__ == "__main__":
+    try:
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_interrupted_batch_resumes(Path(tempfile.mkdtemp()), monkeypatch, load_scan_pair())
+        test_cancelled_batch_reports_progress_and_resumes(Path(tempfile.mkdtemp()), load_scan_pair())
+        test_progress_text()
+        test_checkpoint_of_other_run_is_discarded(Path(tempfile.mkdtemp()))
+        test_torn_manifest_line_is_ignored(Path(tempfile.mkdtemp()))
+        print("\n✓ Checkpoint tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Checkpoint test failed: {e}")
+        sys.exit(1)
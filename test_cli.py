@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests of the headless command-line batch runner.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import pytest
+
+import cli
+import engine
+
+
+def test_cli_does_not_import_tkinter():
+    code = "import sys, cli; sys.exit('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_single_pair(tmp_path):
+    pdf_path = tmp_path / "report.pdf"
+    exit_code = cli.main([
+        "--ref", "test_data_reference.txt",
+        "--meas", "test_data_measurement.txt",
+        "--out", str(pdf_path),
+    ])
+    assert exit_code == 0
+    assert pdf_path.stat().st_size > 0
+
+
+def test_directory_of_measurements(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    content = open("test_data_measurement.txt").read()
+    for name in ("linac1.txt", "linac2.asc"):
+        (exports / name).write_text(content)
+
+    out = tmp_path / "reports"
+    exit_code = cli.main([
+        "--ref", "test_data_reference.txt", "--meas", str(exports), "--out", str(out),
+    ])
+    assert exit_code == 0
+    assert sorted(os.listdir(out)) == ["linac1_gamma.pdf", "linac2_gamma.pdf"]
+
+
+def test_failing_profiles_exit_non_zero(tmp_path):
+    exit_code = cli.main([
+        "--ref", "test_data_reference.txt",
+        "--meas", "test_data_measurement.txt",
+        "--out", str(tmp_path / "report.pdf"),
+        "--pass-threshold", "100.1",
+    ])
+    assert exit_code == 1
+
+
+def test_results_only_prints_table():
+    with redirect_stdout(io.StringIO()) as stdout:
+        exit_code = cli.main([
+            "--ref", "test_data_reference.txt",
+            "--meas", "test_data_measurement.txt",
+            "--results-only",
+        ])
+    assert exit_code == 0
+    output = stdout.getvalue()
+    assert "Pass rate" in output
+    assert "PDF saved" not in output
+
+
+def test_no_evaluable_gamma_points_fails(tmp_path):
+    # Measurement shifted far off the reference: no point has a gamma value
+    shifted = tmp_path / "shifted.txt"
+    lines = []
+    for line in open("test_data_measurement.txt"):
+        if line.startswith("="):
+            fields = line.split("\t")
+            fields[1:3] = [f"{float(value) + 5000:.3f}" for value in fields[1:3]]
+            line = "\t".join(fields)
+        lines.append(line)
+    shifted.write_text("".join(lines))
+
+    for engine_name in ("numpy", "pymedphys"):
+        with redirect_stdout(io.StringIO()) as stdout:
+            exit_code = cli.main(["--ref", "test_data_reference.txt", "--meas", str(shifted),
+                                  "--results-only", "--gamma-engine", engine_name,
+                                  "--normalization", "max"])
+        assert exit_code == 1
+        assert "0/3 profiles passed" in stdout.getvalue()
+
+
+def test_render_failing_only(tmp_path):
+    out = tmp_path / "reports"
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    (exports / "linac1.txt").write_text(open("test_data_measurement.txt").read())
+
+    # Every profile passes at 95%, so no page and no PDF
+    assert cli.main(["--ref", "test_data_reference.txt", "--meas", str(exports),
+                     "--out", str(out), "--render", "failing"]) == 0
+    assert os.listdir(out) == []
+
+    # Above 100% every profile fails and is rendered
+    assert cli.main(["--ref", "test_data_reference.txt", "--meas", str(exports),
+                     "--out", str(out), "--render", "failing",
+                     "--pass-threshold", "100.1"]) == 1
+    assert os.listdir(out) == ["linac1_gamma.pdf"]
+
+
+def test_render_failing_removes_previous_report(tmp_path):
+    pdf_path = tmp_path / "report.pdf"
+    args = ["--ref", "test_data_reference.txt", "--meas", "test_data_measurement.txt",
+            "--out", str(pdf_path)]
+    assert cli.main(args) == 0
+    assert pdf_path.exists()
+
+    # Nothing fails, so nothing is rendered: yesterday's report must not remain
+    with redirect_stdout(io.StringIO()) as stdout:
+        assert cli.main(args + ["--render", "failing"]) == 0
+    assert not pdf_path.exists()
+    assert "removed previous report" in stdout.getvalue()
+
+
+def test_pairing_by_name():
+    pairs = cli.pair_files(["refs/a.txt", "refs/b.txt"], ["new/b.txt", "new/a.txt"])
+    assert pairs == [("refs/b.txt", "new/b.txt"), ("refs/a.txt", "new/a.txt")]
+
+
+def test_matrix_against_several_baselines(tmp_path, monkeypatch):
+    baselines = tmp_path / "baselines"
+    baselines.mkdir()
+    (baselines / "2024.txt").write_text(open("test_data_reference.txt").read())
+    (baselines / "2025.txt").write_text(open("test_data_measurement.txt").read())
+    (baselines / "tps.txt").write_text("not an IBA export")
+
+    loads = []
+    load_scans = engine.load_scans
+    monkeypatch.setattr(engine, 'load_scans',
+                        lambda path, **kwargs: loads.append(path) or load_scans(path, **kwargs))
+    out = tmp_path / "reports"
+    with redirect_stdout(io.StringIO()) as stdout:
+        exit_code = cli.main(["--ref", str(baselines), "--meas", "test_data_measurement.txt",
+                              "--matrix", "--out", str(out), "--gamma-engine", "numpy"])
+
+    assert exit_code == 1  # no pairs against tps.txt
+    assert loads.count("test_data_measurement.txt") == 1  # parsed once for all baselines
+    assert sorted(os.listdir(out)) == ["test_data_measurement_vs_2024_gamma.pdf",
+                                       "test_data_measurement_vs_2025_gamma.pdf"]
+    table = stdout.getvalue().split("against 3 reference files\n")[1].split("\n\n")[0]
+    assert table.splitlines()[0].split() == ["Measurement", "2024", "2025", "tps"]
+    assert table.splitlines()[-2].split() == ["Passed", "3/3", "3/3", "0/0"]
+
+
+def test_matrix_needs_one_measurement_file(tmp_path):
+    try:
+        cli.main(["--ref", "test_data_reference.txt", "--meas", "test_data_*.txt",
+                  "--matrix", "--results-only"])
+    except SystemExit as e:
+        assert e.code == 2
+        return
+    raise AssertionError("Expected an argument error")
+
+
+def test_matrix_table_marks_missing_and_failed_cells():
+    table = engine.format_matrix_table({
+        'baseline': [(1.0, 1.0, 1.0, None), (2.0, 2.0, 0.9, None)],
+        'tps': [(1.0, 4.0, None, "Cannot determine scan direction")],
+        'old': None,
+    })
+    rows = [line.split() for line in table.splitlines()]
+    assert rows[2] == ["1", "100.00%", "✓", "ERROR", "-"]
+    assert rows[3] == ["2", "90.00%", "✗", "-", "-"]
+    assert rows[-2] == ["Passed", "1/2", "0/1", "ERROR"]
+    assert rows[-1] == ["Mean", "95.00%", "-", "ERROR"]
+
+
+if __name__ == "__main__":
+    try:
+        test_cli_does_not_import_tkinter()
+        test_single_pair(Path(tempfile.mkdtemp()))
+        test_directory_of_measurements(Path(tempfile.mkdtemp()))
+        test_failing_profiles_exit_non_zero(Path(tempfile.mkdtemp()))
+        test_results_only_prints_table()
+        test_no_evaluable_gamma_points_fails(Path(tempfile.mkdtemp()))
+        test_render_failing_only(Path(tempfile.mkdtemp()))
+        test_render_failing_removes_previous_report(Path(tempfile.mkdtemp()))
+        test_pairing_by_name()
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_matrix_against_several_baselines(Path(tempfile.mkdtemp()), monkeypatch)
+        test_matrix_needs_one_measurement_file(Path(tempfile.mkdtemp()))
+        test_matrix_table_marks_missing_and_failed_cells()
+        print("\n✓ CLI tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ CLI test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests of the per-pair results export.
+"""
+
+import csv
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+import cli
+import engine
+from conftest import load_scan_pair
+from export import COLUMNS, ResultsExport, summary_path
+
+
+def test_cli_writes_rows_and_summary(tmp_path):
+    results = tmp_path / "results.csv"
+    exit_code = cli.main(["--ref", "test_data_reference.txt",
+                          "--meas", "test_data_measurement.txt", "--results-only",
+                          "--gamma-engine", "numpy", "--results", str(results)])
+    assert exit_code == 0
+
+    rows = list(csv.DictReader(open(results)))
+    assert len(rows) == 3
+    assert list(rows[0]) == list(COLUMNS)
+    for row in rows:
+        assert row['passed'] == 'True' and row['error'] == ''
+        assert row['measurement_file'] == "test_data_measurement.txt"
+        assert row['ref_scan_type'] == row['mes_scan_type'] == 'PRO'
+        assert float(row['gamma_mean']) <= float(row['gamma_max'])
+        assert int(row['points_evaluated']) <= int(row['points_evaluation'])
+
+    summary = json.load(open(summary_path(results)))
+    assert summary['pairs'] == summary['passed'] == 3 and summary['errors'] == 0
+    assert summary['gamma_config']['gamma_engine'] == 'numpy'
+    assert summary['stage_timing']['gamma']['calls'] == 1  # one vectorized batch
+
+
+def test_resumed_pairs_are_exported(tmp_path, scan_pair):
+    reference, measurement = scan_pair
+    pdf_path = tmp_path / "report.pdf"
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    cancel = threading.Event()
+    first = ResultsExport(tmp_path / "first.csv", gamma_config=config, chunk_size=1)
+    with first:
+        first.begin("ref.txt", "meas.txt")
+        engine.run_batch(reference, measurement, pdf_path, config, export=first,
+                         progress=lambda done, total: done and cancel.set(), cancel=cancel)
+    assert first.rows == 1
+
+    with ResultsExport(tmp_path / "second.csv", gamma_config=config) as second:
+        second.begin("ref.txt", "meas.txt")
+        engine.run_batch(reference, measurement, pdf_path, config, export=second)
+
+    first_rows = list(csv.DictReader(open(tmp_path / "first.csv")))
+    second_rows = list(csv.DictReader(open(tmp_path / "second.csv")))
+    assert len(second_rows) == 3
+    assert second_rows[0]['gamma_max'] == first_rows[0]['gamma_max'] != ''
+
+
+def test_parquet_output(tmp_path, scan_pair):
+    pq = pytest.importorskip("pyarrow.parquet")
+    reference, measurement = scan_pair
+    path = tmp_path / "results.parquet"
+    with ResultsExport(path, chunk_size=2) as export:
+        export.begin("ref.txt", "meas.txt")
+        engine.run_batch(reference, measurement, None,
+                         dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy'),
+                         export=export)
+
+    table = pq.read_table(path)
+    assert table.num_rows == 3 and table.column_names == list(COLUMNS)
+
+
+def test_unknown_format_raises(tmp_path):
+    try:
+        ResultsExport(tmp_path / "results.xlsx")
+    except Exception as e:
+        assert "Unknown results format" in str(e)
+        return
+    raise AssertionError("Expected an error for an unknown format")
+
+
+if __name__ == "__main__":
+    try:
+        test_cli_writes_rows_and_summary(Path(tempfile.mkdtemp()))
+        test_resumed_pairs_are_exported(Path(tempfile.mkdtemp()), load_scan_pair())
+        try:
+            test_parquet_output(Path(tempfile.mkdtemp()), load_scan_pair())
+        except pytest.skip.Exception as e:
+            print(f"⚠ test_parquet_output skipped: {e}")
+        test_unknown_format_raises(Path(tempfile.mkdtemp()))
+        print("\n✓ Results export tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Results export test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Validation of the native 1D gamma kernel against pymedphys.gamma.
+"""
+
+import sys
+
+import numpy as np
+import pymedphys
+
+import engine
+from gamma1d import gamma_1d, gamma_1d_batch
+
+# Evaluation profile perturbations: (position shift mm, dose scale)
+PERTURBATIONS = [(0.0, 1.0), (1.3, 1.03), (-2.5, 0.97), (0.7, 1.0)]
+
+
+def bundled_profiles():
+    """(axis, dose) reference and evaluation profiles of every matched pair."""
+    reference = engine.load_scans("test_data_reference.txt")
+    measurement = engine.load_scans("test_data_measurement.txt")
+
+    for measure_num, ref_num in engine.match_scans(measurement, reference):
+        ref_x, ref_y, ref_dose = engine.prepare_profile(reference.scan(ref_num)[1])
+        mes_x, mes_y, mes_dose = engine.prepare_profile(measurement.scan(measure_num)[1])
+        if np.ptp(ref_x) > 0:
+            yield ref_x, ref_dose, mes_x, mes_dose
+        else:
+            yield ref_y, ref_dose, mes_y, mes_dose
+
+
+def check_against_pymedphys(local_gamma):
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, local_gamma=local_gamma)
+    del config['gamma_engine'], config['normalization']
+
+    for ref_axis, ref_dose, mes_axis, mes_dose in bundled_profiles():
+        for shift, scale in PERTURBATIONS:
+            expected = pymedphys.gamma(ref_axis, ref_dose, mes_axis + shift,
+                                       mes_dose * scale, **config)
+            actual = gamma_1d(ref_axis, ref_dose, mes_axis + shift,
+                              mes_dose * scale, **config)
+
+            assert np.array_equal(np.isnan(actual), np.isnan(expected))
+            assert np.allclose(actual, expected, rtol=0, atol=1e-9, equal_nan=True)
+
+
+def test_global_gamma_matches_pymedphys():
+    check_against_pymedphys(local_gamma=False)
+
+
+def test_local_gamma_matches_pymedphys():
+    check_against_pymedphys(local_gamma=True)
+
+
+def test_cutoff_and_cap():
+    axis = np.arange(-50.0, 51.0)
+    dose = np.exp(-(axis / 30) ** 2)
+
+    gamma = gamma_1d(axis, dose, axis, dose * 1.2, 2, 2,
+                     lower_percent_dose_cutoff=50, max_gamma=2)
+
+    assert np.all(np.isnan(gamma[dose < 0.5]))
+    assert np.nanmax(gamma) == 2
+
+
+def test_engine_selection():
+    reference = engine.load_scans("test_data_reference.txt")
+    measurement = engine.load_scans("test_data_measurement.txt")
+
+    for engine_name in engine.GAMMA_ENGINES:
+        config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine=engine_name)
+        result = engine.compute_gamma(measurement, reference, 1.0, 1.0, config)
+        assert result.pass_ratio == 1.0
+
+
+def test_batch_matches_single_profiles():
+    rng = np.random.default_rng(0)
+    profiles = []
+    for _ in range(20):
+        ref_axis = np.linspace(-150, 150, rng.integers(40, 300))
+        mes_axis = np.linspace(-140 + rng.normal(), 160, rng.integers(40, 300))
+        ref_dose = np.exp(-(ref_axis / 80) ** 8) + 0.02
+        mes_dose = (np.exp(-((mes_axis - rng.normal()) / 80) ** 8) + 0.02) * rng.normal(1, 0.01)
+        profiles.append((ref_axis, ref_dose, mes_axis, mes_dose))
+
+    for local_gamma in (False, True):
+        config = dict(engine.DEFAULT_GAMMA_CONFIG, local_gamma=local_gamma)
+        del config['gamma_engine'], config['normalization']
+
+        # A tiny RAM budget forces several chunks
+        gammas, pass_ratios = gamma_1d_batch(profiles, **dict(config, ram_available=2 ** 16))
+        for profile, gamma, pass_ratio in zip(profiles, gammas, pass_ratios):
+            expected = gamma_1d(*profile, **config)
+            assert gamma.shape == expected.shape
+            assert np.allclose(gamma, expected, rtol=0, atol=1e-9, equal_nan=True)
+            valid = expected[~np.isnan(expected)]
+            assert np.isclose(pass_ratio, np.sum(valid <= 1) / len(valid))
+
+
+def test_engine_batch_keyed_by_pair():
+    reference = engine.load_scans("test_data_reference.txt")
+    measurement = engine.load_scans("test_data_measurement.txt")
+    matches = engine.match_scans(measurement, reference)
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+
+    results, errors = engine.compute_gamma_batch(measurement, reference, matches, config)
+
+    assert errors == {}
+    assert sorted(results) == sorted(map(tuple, matches))
+    for (measure_num, ref_num), result in results.items():
+        single = engine.compute_gamma(measurement, reference, measure_num, ref_num, config)
+        assert result.direction == single.direction
+        assert np.allclose(result.gamma, single.gamma, equal_nan=True)
+        assert result.pass_ratio == single.pass_ratio
+
+
+if __name__ == "__main__":
+    try:
+        test_global_gamma_matches_pymedphys()
+        test_local_gamma_matches_pymedphys()
+        test_cutoff_and_cap()
+        test_engine_selection()
+        test_batch_matches_single_profiles()
+        test_engine_batch_keyed_by_pair()
+        print("\n✓ Gamma tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Gamma test failed: {e}")
+        sys.exit(1)
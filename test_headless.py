@@ -7,9 +7,7 @@ This runs the complete analysis without GUI.
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 
-from main import GammaAnalysisApp
-import pandas as pd
-from matplotlib.backends.backend_pdf import PdfPages
+import engine
 
 def run_headless_test():
     """Run gamma analysis test without GUI."""
@@ -18,25 +16,17 @@ def run_headless_test():
     print("Running Headless Gamma Analysis Test")
     print("="*60)
 
-    # Create app instance (will create GUI window but we won't show it)
-    print("\n1. Initializing application...")
-    app = GammaAnalysisApp()
+    print("\n1. Using engine defaults...")
+    gamma_config = dict(engine.DEFAULT_GAMMA_CONFIG)
+    print(f"   ✓ {gamma_config['dose_percent_threshold']}%/"
+          f"{gamma_config['distance_mm_threshold']}mm, "
+          f"cutoff {gamma_config['lower_percent_dose_cutoff']}%")
 
     # Load reference file
     print("\n2. Loading reference file...")
     try:
-        ref_data, ref_header = app._parse_ascii_file("test_data_reference.txt")
-        app.reference_data_full = ref_data
-        app.reference_header = ref_header
-        app.reference_dataframe = pd.DataFrame(
-            ref_data,
-            columns=[
-                'measurement number', 'measurement data', 'measurement time',
-                'measurement type', 'beam type', 'beam energy', 'field size x',
-                'field size y', 'SSD', 'startZ', 'stopZ', 'xpos', 'ypos',
-                'zpos', 'dose'
-            ]
-        )
+        reference_scans = engine.load_scans("test_data_reference.txt")
+        ref_header = reference_scans.headers
         print(f"   ✓ Loaded {len(ref_header)} reference measurements")
         for i, h in enumerate(ref_header, 1):
             print(f"     {i}. {h[4]} {h[5]}MV, {h[6]}x{h[7]}mm")
@@ -47,18 +37,8 @@ def run_headless_test():
     # Load measurement file
     print("\n3. Loading measurement file...")
     try:
-        mes_data, mes_header = app._parse_ascii_file("test_data_measurement.txt")
-        app.measurement_data_full = mes_data
-        app.measurement_header = mes_header
-        app.measurement_dataframe = pd.DataFrame(
-            mes_data,
-            columns=[
-                'measurement number', 'measurement data', 'measurement time',
-                'measurement type', 'beam type', 'beam energy', 'field size x',
-                'field size y', 'SSD', 'startZ', 'stopZ', 'xpos', 'ypos',
-                'zpos', 'dose'
-            ]
-        )
+        measurement_scans = engine.load_scans("test_data_measurement.txt")
+        mes_header = measurement_scans.headers
         print(f"   ✓ Loaded {len(mes_header)} measurement measurements")
         for i, h in enumerate(mes_header, 1):
             print(f"     {i}. {h[4]} {h[5]}MV, {h[6]}x{h[7]}mm")
@@ -69,7 +49,7 @@ def run_headless_test():
     # Find matches
     print("\n4. Finding matching measurement pairs...")
     try:
-        matches = app._find_matching_tests()
+        matches = engine.match_scans(measurement_scans, reference_scans)
         print(f"   ✓ Found {len(matches)} matching pairs")
 
         if len(matches) == 0:
@@ -85,24 +65,16 @@ def run_headless_test():
     pdf_path = "test_output_gamma_analysis.pdf"
 
     try:
-        app.pdf_pages = PdfPages(pdf_path)
+        batch = engine.run_batch(reference_scans, measurement_scans, pdf_path, gamma_config)
 
-        successful = 0
-        failed = 0
         results = []
-
-        for measure_num, ref_num in matches:
-            try:
-                print(f"\n   Processing pair: Measurement #{measure_num} vs Reference #{ref_num}")
-                app._process_gamma_pair(measure_num, ref_num)
-                successful += 1
-                results.append((measure_num, ref_num, "SUCCESS"))
-            except Exception as e:
-                failed += 1
-                results.append((measure_num, ref_num, f"FAILED: {str(e)}"))
-                print(f"   ✗ Failed: {e}")
-
-        app.pdf_pages.close()
+        for measure_num, ref_num, pass_ratio, error in batch:
+            if error is None:
+                results.append((measure_num, ref_num, f"SUCCESS ({pass_ratio*100:.2f}%)"))
+            else:
+                results.append((measure_num, ref_num, f"FAILED: {error}"))
+        successful = sum(1 for result in batch if result[3] is None)
+        failed = len(batch) - successful
 
         print(f"\n   ✓ Analysis complete!")
         print(f"     - Successful: {successful}/{len(matches)}")
@@ -110,8 +82,6 @@ def run_headless_test():
         print(f"     - PDF saved: {pdf_path}")
 
     except Exception as e:
-        if app.pdf_pages:
-            app.pdf_pages.close()
         print(f"   ✗ Gamma analysis failed: {e}")
         import traceback
         traceback.print_exc()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests of per-stage timing and profiling instrumentation.
+"""
+
+import csv
+import json
+import pstats
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import numpy as np
+
+import cli
+import engine
+from instrumentation import RunProfiler, stage
+
+
+def test_stage_is_a_no_op_without_profiler():
+    with stage('gamma'):
+        pass
+    with RunProfiler() as profiler:
+        pass
+    assert profiler.records == []
+    assert not tracemalloc.is_tracing()
+
+
+def test_nested_stage_peaks():
+    with RunProfiler(trace_memory=True) as profiler:
+        with stage('parse', item='file.txt'):
+            with stage('normalize'):
+                inner = np.ones(2 ** 20)  # 8 MB
+                del inner
+            outer = np.ones(2 ** 18)  # 2 MB
+            del outer
+
+    normalize, parse = profiler.records
+    assert normalize['stage'] == 'normalize' and parse['item'] == 'file.txt'
+    assert normalize['peak_bytes'] >= 8 * 2 ** 20
+    # The outer stage's peak includes the inner stage's allocation
+    assert parse['peak_bytes'] >= normalize['peak_bytes']
+    assert parse['wall_s'] >= normalize['wall_s']
+
+
+def test_batch_records_every_stage(tmp_path):
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    with RunProfiler(cprofile_stages=['gamma']) as profiler:
+        reference = engine.load_scans("test_data_reference.txt")
+        measurement = engine.open_scans("test_data_measurement.txt")
+        results = engine.run_batch(reference, measurement, tmp_path / "report.pdf", config)
+
+    summary = profiler.summary()
+    assert list(summary) == ['parse', 'normalize', 'match', 'gamma', 'render',
+                             'checkpoint', 'merge']
+    renders = [r for r in profiler.records if r['stage'] == 'render']
+    assert sorted(r['item'] for r in renders) == sorted(
+        f"{m:g}/{r:g}" for m, r, _, _ in results)
+
+    paths = profiler.write(tmp_path / "timings.json")
+    assert paths[1].endswith("timings.gamma.prof")
+    report = json.load(open(paths[0]))
+    assert report['summary']['gamma']['count'] == len(results)
+    assert pstats.Stats(paths[1]).total_calls > 0
+
+    profiler.write(tmp_path / "timings.csv")
+    rows = list(csv.DictReader(open(tmp_path / "timings.csv")))
+    assert len(rows) == len(profiler.records)
+    print(profiler.format_summary())
+
+
+def test_worker_records_are_merged():
+    reference = engine.load_scans("test_data_reference.txt")
+    measurement = engine.load_scans("test_data_measurement.txt")
+    with RunProfiler(trace_memory=True) as profiler:
+        results = engine.run_batch(reference, measurement, None, workers=2)
+
+    gammas = [r for r in profiler.records if r['stage'] == 'gamma']
+    assert len(gammas) == len(results)
+    assert all(r['peak_bytes'] is not None for r in gammas)
+    assert all(r['pid'] != profiler.records[0]['pid'] for r in gammas)
+
+
+def test_cli_profile_option(tmp_path):
+    timings = tmp_path / "timings.csv"
+    exit_code = cli.main([
+        "--ref", "test_data_reference.txt",
+        "--meas", "test_data_measurement.txt",
+        "--results-only", "--profile", str(timings), "--cprofile", "parse",
+    ])
+    assert exit_code == 0
+    stages = {row['stage'] for row in csv.DictReader(open(timings))}
+    assert {'parse', 'match', 'gamma'} <= stages
+    assert (tmp_path / "timings.parse.prof").exists()
+
+
+if __name__ == "__main__":
+    try:
+        test_stage_is_a_no_op_without_profiler()
+        test_nested_stage_peaks()
+        test_batch_records_every_stage(Path(tempfile.mkdtemp()))
+        test_worker_records_are_merged()
+        test_cli_profile_option(Path(tempfile.mkdtemp()))
+        print("\n✓ Instrumentation tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Instrumentation test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests of the indexed reference matcher.
+"""
+
+import sys
+
+from matching import find_matches
+from scan_store import ScanHeader, load_scan_set
+
+
+def legacy_find_matches(measurement_header, reference_header):
+    """Original nested-loop matcher (first hit in file order)."""
+    matches = []
+    for measure in measurement_header:
+        for reference in reference_header:
+            if (measure[3] == reference[3] and
+                measure[4] == reference[4] and
+                measure[5] == reference[5] and
+                measure[6] == reference[6] and
+                abs(measure[11] - reference[11]) < 10 and
+                ((measure[9] == 0 and reference[9] == 0) or
+                 (measure[10] == 0 and reference[10] == 0))):
+                matches.append([measure[0], reference[0]])
+                break
+    return matches
+
+
+def make_header(number, depth, start_x=-100.0, start_y=0.0, field_size=100.0):
+    return ScanHeader(number, '01-15-2024', '10:30:00', 'PRO', 'PHO', 6.0,
+                      field_size, field_size, 1000.0, start_x, start_y, depth, depth)
+
+
+def test_matches_bundled_test_data():
+    references = load_scan_set("test_data_reference.txt").headers
+    measurements = load_scan_set("test_data_measurement.txt").headers
+
+    matches, ambiguous = find_matches(measurements, references)
+    assert matches == legacy_find_matches(measurements, references)
+    assert len(matches) == 3
+    assert ambiguous == []
+
+
+def test_nearest_depth_wins():
+    references = [make_header(1.0, 95.0), make_header(2.0, 100.0), make_header(3.0, 104.0)]
+    measurements = [make_header(10.0, 101.0), make_header(11.0, 103.5)]
+
+    matches, ambiguous = find_matches(measurements, references)
+    assert matches == [[10.0, 2.0], [11.0, 3.0]]
+    assert ambiguous == []
+
+
+def test_depth_tolerance_and_orientation():
+    references = [make_header(1.0, 100.0), make_header(2.0, 100.0, start_x=0.0, start_y=-100.0)]
+    measurements = [
+        make_header(10.0, 110.0),                             # outside tolerance
+        make_header(11.0, 100.0, start_x=0.0, start_y=-50.0),  # crossline only
+        make_header(12.0, 100.0, field_size=200.0),           # no field size match
+    ]
+
+    matches, _ = find_matches(measurements, references)
+    assert matches == [[11.0, 2.0]]
+
+
+def test_duplicates_reported():
+    references = [make_header(1.0, 98.0), make_header(2.0, 102.0), make_header(3.0, 102.0)]
+    measurements = [make_header(10.0, 100.0)]
+
+    matches, ambiguous = find_matches(measurements, references)
+    assert matches == [[10.0, 1.0]]
+    assert ambiguous == [(10.0, [1.0, 2.0, 3.0])]
+    print(f"✓ Ambiguous candidates reported: {ambiguous}")
+
+
+if __name__ == "__main__":
+    try:
+        test_matches_bundled_test_data()
+        test_nearest_depth_wins()
+        test_depth_tolerance_and_orientation()
+        test_duplicates_reported()
+        print("\n✓ Matching tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Matching test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests of process-pool batch execution.
+"""
+
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import numpy as np
+from pypdf import PdfReader
+
+import engine
+from scan_store import ScanSet
+
+
+def with_diagonal_scan(scans):
+    """Copy of a ScanSet whose first scan is neither inline nor crossline."""
+    points = scans.points.copy()
+    first = slice(scans.offsets[0], scans.offsets[1])
+    points[first, 1] = points[first, 0]
+    return ScanSet(scans.headers, points, scans.offsets)
+
+
+def test_parallel_matches_sequential(tmp_path):
+    reference = engine.load_scans("test_data_reference.txt")
+    measurement = engine.load_scans("test_data_measurement.txt")
+
+    sequential = engine.run_batch(reference, measurement, tmp_path / "seq.pdf")
+    parallel = engine.run_batch(reference, measurement, tmp_path / "par.pdf", workers=2)
+
+    assert [r[:2] for r in parallel] == [r[:2] for r in sequential]
+    assert np.allclose([r[2] for r in parallel], [r[2] for r in sequential])
+    assert len(PdfReader(tmp_path / "par.pdf").pages) == len(sequential)
+
+
+def test_parallel_counts_failed_pairs(tmp_path):
+    reference = with_diagonal_scan(engine.load_scans("test_data_reference.txt"))
+    measurement = engine.load_scans("test_data_measurement.txt")
+
+    results = engine.run_batch(reference, measurement, tmp_path / "par.pdf", workers=2)
+
+    errors = [r[3] for r in results]
+    assert errors[0] is not None and errors[1:] == [None, None]
+    assert len(PdfReader(tmp_path / "par.pdf").pages) == 2
+
+
+def test_parallel_batch_can_be_cancelled(tmp_path):
+    reference = engine.load_scans("test_data_reference.txt")
+    measurement = engine.load_scans("test_data_measurement.txt")
+    cancel = threading.Event()
+    cancel.set()  # stop after the first finished pair
+
+    results = engine.run_batch(reference, measurement, tmp_path / "par.pdf", workers=2,
+                               cancel=cancel)
+    assert len(results) == 1
+    assert not (tmp_path / "par.pdf").exists()
+
+
+if __name__ == "__main__":
+    try:
+        test_parallel_matches_sequential(Path(tempfile.mkdtemp()))
+        test_parallel_counts_failed_pairs(Path(tempfile.mkdtemp()))
+        test_parallel_batch_can_be_cancelled(Path(tempfile.mkdtemp()))
+        print("\n✓ Parallel batch tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Parallel batch test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Parity test of the single-pass ASCII parser against the original
+per-line regex tokenizer.
+"""
+
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from ascii_parser import MappedAsciiFile, parse_ascii_file
+
+
+def legacy_parse_ascii_file(filepath):
+    """Original per-line parser, kept here as the parity reference."""
+    data = []
+    with open(filepath) as file:
+        for line in file:
+            cleanlist = list(filter(None, re.split('\t|#|\n', line)))
+            if cleanlist:
+                data.append(cleanlist)
+
+    full_list = []
+    measurement_list = []
+    measurement_number = measurement_type = measurement_date = None
+    measurement_time = field_size_x = field_size_y = None
+    beam_type = beam_energy = ssd = None
+    start_x = start_y = start_z = stop_z = None
+
+    for line in data:
+        tag = line[0]
+        if tag == ' Measurement number ':
+            measurement_number = float(line[1])
+        elif tag == '%SCN':
+            measurement_type = line[1]
+        elif tag == '%DAT':
+            measurement_date = line[1]
+        elif tag == '%TIM':
+            measurement_time = line[1]
+        elif tag == '%FSZ':
+            field_size_x = float(line[1])
+            field_size_y = float(line[2])
+        elif tag == '%BMT':
+            beam_type = line[1]
+            beam_energy = float(line[2])
+        elif tag == '%SSD':
+            ssd = float(line[1])
+        elif tag == '%STS':
+            start_x = float(line[1])
+            start_y = float(line[2])
+            start_z = float(line[3])
+        elif tag == '%EDS':
+            stop_z = float(line[3])
+        elif tag == "=":
+            full_list.append([
+                measurement_number, measurement_date, measurement_time,
+                measurement_type, beam_type, beam_energy, field_size_x,
+                field_size_y, ssd, start_z, stop_z, float(line[1]),
+                float(line[2]), float(line[3]), float(line[4])
+            ])
+        elif tag == ":EOM  ":
+            measurement_list.append([
+                measurement_number, measurement_date, measurement_time,
+                measurement_type, beam_type, beam_energy, field_size_x,
+                field_size_y, ssd, start_x, start_y, start_z, stop_z
+            ])
+
+    return full_list, measurement_list
+
+
+def check_parity(filepath):
+    """Compare headers and data points of both parsers for one file."""
+    legacy_full, legacy_header = legacy_parse_ascii_file(filepath)
+    headers, scans = parse_ascii_file(filepath)
+
+    assert headers == legacy_header, f"{filepath}: header records differ"
+
+    legacy_points = np.array([row[11:] for row in legacy_full])
+    points = np.concatenate(scans)
+    assert points.dtype == np.float64
+    assert points.shape == legacy_points.shape, f"{filepath}: point count differs"
+    assert np.array_equal(points, legacy_points), f"{filepath}: data points differ"
+
+    numbers = [row[0] for row in legacy_full]
+    expected = [h[0] for h, scan in zip(headers, scans) for _ in range(len(scan))]
+    assert numbers == expected, f"{filepath}: points assigned to wrong measurement"
+
+    print(f"✓ {filepath}: {len(headers)} measurements, {len(points)} points match")
+
+
+def test_parser_parity_reference():
+    check_parity("test_data_reference.txt")
+
+
+def test_parser_parity_measurement():
+    check_parity("test_data_measurement.txt")
+
+
+def test_irregular_block_falls_back(tmp_path):
+    """Comment lines between data rows are skipped instead of breaking the block."""
+    content = open("test_data_reference.txt").read()
+    content = content.replace("=\t0.000\t0.000\t100.000\t1.0000\n",
+                              "=\t0.000\t0.000\t100.000\t1.0000\n# operator note\n", 1)
+    filepath = tmp_path / "irregular.txt"
+    filepath.write_text(content)
+
+    headers, scans = parse_ascii_file(filepath)
+    _, reference_scans = parse_ascii_file("test_data_reference.txt")
+    assert len(headers) == 3
+    assert all(np.array_equal(a, b) for a, b in zip(scans, reference_scans))
+
+
+def test_windows_line_endings(tmp_path):
+    content = open("test_data_reference.txt").read()
+    filepath = tmp_path / "crlf.txt"
+    filepath.write_bytes(content.replace("\n", "\r\n").encode())
+
+    headers, scans = parse_ascii_file(filepath)
+    reference_headers, reference_scans = parse_ascii_file("test_data_reference.txt")
+    assert headers == reference_headers
+    assert all(np.array_equal(a, b) for a, b in zip(scans, reference_scans))
+
+
+def test_mapped_reader_memory_scales_with_one_scan(tmp_path):
+    """Indexing and reading one scan of a large export never holds the whole file."""
+    import tracemalloc
+
+    content = open("test_data_reference.txt").read()
+    blocks = content.split("\n:EOF")[0]
+    filepath = tmp_path / "large.txt"
+    with open(filepath, "w") as file:
+        for _ in range(300):
+            file.write(blocks + "\n")
+        file.write(":EOF\n")
+    file_size = filepath.stat().st_size
+
+    tracemalloc.start()
+    with MappedAsciiFile(filepath) as export:
+        index_size, index_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        points = export.read_scan(len(export) - 1)
+        read_peak = tracemalloc.get_traced_memory()[1] - index_size
+    tracemalloc.stop()
+
+    assert len(export) == 900
+    assert np.array_equal(points, parse_ascii_file("test_data_reference.txt")[1][-1])
+    # Only the header records are kept while indexing, never the file text
+    assert index_peak < file_size / 2, f"index peak {index_peak} for {file_size} bytes"
+    assert read_peak < file_size / 20, f"read peak {read_peak} for {file_size} bytes"
+    print(f"✓ {file_size} byte file: {index_peak} byte index peak, "
+          f"{read_peak} byte read peak")
+
+
+if __name__ == "__main__":
+    try:
+        test_parser_parity_reference()
+        test_parser_parity_measurement()
+        test_irregular_block_falls_back(Path(tempfile.mkdtemp()))
+        test_windows_line_endings(Path(tempfile.mkdtemp()))
+        test_mapped_reader_memory_scales_with_one_scan(Path(tempfile.mkdtemp()))
+        print("\n✓ Parser tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Parser test failed: {e}")
+        sys.exit(1)
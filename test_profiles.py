@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests of vectorized profile preparation against the per-scan original.
+"""
+
+import sys
+
+import numpy as np
+
+from profiles import CROSSLINE, INLINE, NORMALIZATION_MODES, prepare_profiles
+from scan_store import DOSE, X, Y, ScanSet, load_scan_set
+
+
+def legacy_prepare_profile(points):
+    """Original per-scan preparation and direction check."""
+    xpos, ypos, dose = points[:, X], points[:, Y], points[:, DOSE]
+    center = (xpos > -1) & (xpos < 1) & (ypos > -1) & (ypos < 1)
+    normal_dose = dose / dose[center].mean()
+    order = np.lexsort((ypos, xpos))[1:-1]
+    xpos, ypos, normal_dose = xpos[order], ypos[order], normal_dose[order]
+
+    midpoint = len(xpos) // 2
+    direction = (INLINE if xpos[midpoint] == xpos[0] else
+                 CROSSLINE if ypos[midpoint] == ypos[0] else None)
+    return direction, xpos, ypos, normal_dose
+
+
+def shuffled(scans, seed=0):
+    """Copy of a ScanSet with the points of every scan in random order."""
+    rng = np.random.default_rng(seed)
+    points = scans.points.copy()
+    for start, stop in zip(scans.offsets[:-1], scans.offsets[1:]):
+        points[start:stop] = rng.permutation(points[start:stop])
+    return ScanSet(scans.headers, points, scans.offsets)
+
+
+def check_matches_legacy(scans):
+    for i, header in enumerate(scans.headers):
+        direction, x, y, dose = scans.profile(header.number)[1]
+        expected = legacy_prepare_profile(scans.scan(header.number)[1])
+        assert direction == expected[0]
+        assert np.array_equal(x, expected[1])
+        assert np.array_equal(y, expected[2])
+        assert np.allclose(dose, expected[3], rtol=1e-14, atol=0)
+
+
+def test_matches_per_scan_preparation():
+    for filepath in ("test_data_reference.txt", "test_data_measurement.txt"):
+        scans = load_scan_set(filepath)
+        check_matches_legacy(scans)
+        check_matches_legacy(shuffled(scans))
+
+
+def test_directions_and_empty_scans():
+    # Crossline, inline, diagonal and a two-point scan (empty after trimming)
+    line = np.linspace(-10, 10, 21)
+    zeros = np.zeros_like(line)
+    scans = [
+        np.column_stack([line, zeros, zeros, 2 - np.abs(line) / 10]),
+        np.column_stack([zeros, line, zeros, 2 - np.abs(line) / 10]),
+        np.column_stack([line, line, zeros, 2 - np.abs(line) / 10]),
+        np.array([[0.0, 0.0, 0.0, 1.0], [1.0, 0.0, 0.0, 1.0]]),
+    ]
+    points = np.concatenate(scans)
+    offsets = np.cumsum([0] + [len(scan) for scan in scans])
+
+    profiles = prepare_profiles(points[:, X], points[:, Y], points[:, DOSE], offsets)
+    assert profiles.directions == [CROSSLINE, INLINE, None, None]
+    assert list(np.diff(profiles.offsets)) == [19, 19, 19, 0]
+    assert np.isclose(profiles.profile(0)[3].max(), 1.0)
+
+
+def off_axis_profiles():
+    """A crossline and an inline scan of a field centred off the axis.
+
+    The samples fall at odd positions, so no point lies within ±1 mm of the
+    axis, and the inline scan is stored in reverse order.
+    """
+    position = np.arange(-29.0, 72.0, 2.0)
+    dose = np.interp(position, [-10, 0, 30, 40, 50], [0, 1.5, 2, 1.5, 0])
+    zeros = np.zeros_like(position)
+    points = np.concatenate([
+        np.column_stack([position, zeros, zeros, dose]),
+        np.column_stack([zeros, position, zeros, dose])[::-1],
+    ])
+    offsets = [0, len(position), 2 * len(position)]
+    return position, dose, prepare_profiles(points[:, X], points[:, Y], points[:, DOSE], offsets)
+
+
+def test_normalization_modes():
+    position, dose, profiles = off_axis_profiles()
+    assert profiles.directions == [CROSSLINE, INLINE]
+
+    # 50% edges from the linear flanks; the field centre lies between them
+    half = dose.max() / 2
+    centre = ((-10 + 10 * half / 1.5) + (50 - 10 * half / 1.5)) / 2
+    expected = {
+        'max': dose.max(),
+        'interpolated_cax': np.interp(0, position, dose),
+        'field_centre': 1.5 + 0.5 * centre / 30,
+    }
+    for mode, factor in expected.items():
+        assert np.allclose(profiles.factors[mode], factor, rtol=1e-12)
+        for i in range(len(profiles)):
+            normal_dose = profiles.profile(i, mode)[3]
+            assert np.allclose(normal_dose, dose[1:-1] / factor, rtol=1e-12)
+    assert set(profiles.factors) == set(NORMALIZATION_MODES)
+
+    # No point within ±1 mm of the axis: no central axis dose
+    assert np.isnan(profiles.factors['cax']).all()
+
+
+def test_unusable_normalization_is_reported():
+    import engine
+
+    _, _, profiles = off_axis_profiles()
+    try:
+        engine.pair_profiles(profiles.profile(0, 'cax'), profiles.profile(1, 'cax'))
+    except Exception as e:
+        assert "normalise" in str(e)
+    else:
+        raise AssertionError("Expected an error for a profile without central axis dose")
+
+    try:
+        profiles.profile(0, 'median')
+    except Exception as e:
+        assert "Unknown normalization mode" in str(e)
+    else:
+        raise AssertionError("Expected an error for an unknown mode")
+
+
+if __name__ == "__main__":
+    try:
+        test_matches_per_scan_preparation()
+        test_directions_and_empty_scans()
+        test_normalization_modes()
+        test_unusable_normalization_is_reported()
+        print("\n✓ Profile preparation tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Profile preparation test failed: {e}")
+        sys.exit(1)
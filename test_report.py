@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests of the reusable report page template.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+from pypdf import PdfReader
+
+import engine
+import report
+from conftest import load_scan_pair
+
+
+def gamma_results(scan_pair):
+    reference, measurement = scan_pair
+    matches = engine.match_scans(measurement, reference)
+    return [engine.compute_gamma(measurement, reference, m, r) for m, r in matches]
+
+
+def test_template_refills_one_figure(tmp_path, scan_pair):
+    results = gamma_results(scan_pair)
+    template = report.ReportTemplate()
+    figure = template.fig
+
+    with PdfPages(tmp_path / "report.pdf") as pdf_pages:
+        for result in results:
+            template.render(result, pdf_pages)
+
+            assert template.fig is figure
+            assert template.ref_texts[0].get_text() == result.ref_header.date
+            assert template.mes_texts[1].get_text() == result.mes_header.time
+            assert template.pass_text.get_text() == f"{result.pass_ratio * 100:.2f}%"
+            assert np.array_equal(template.curve_eval.get_xdata(), result.axis_evaluation)
+
+            valid_gamma = result.gamma[~np.isnan(result.gamma)]
+            heights, _ = np.histogram(valid_gamma, template.bins, density=True)
+            assert np.allclose([bar.get_height() for bar in template.bars], heights)
+
+    assert len(PdfReader(tmp_path / "report.pdf").pages) == len(results)
+
+
+def test_render_report_rebuilds_template_for_new_config(tmp_path, scan_pair):
+    result = gamma_results(scan_pair)[0]
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, max_gamma=3)
+
+    with PdfPages(tmp_path / "report.pdf") as pdf_pages:
+        engine.render_report(result, pdf_pages)
+        first = engine._report_template
+        engine.render_report(result, pdf_pages)
+        assert engine._report_template is first
+
+        engine.render_report(result, pdf_pages, config)
+        assert engine._report_template is not first
+        assert engine._report_template.ax_hist.get_xlim() == (0, 3)
+
+
+if __name__ == "__main__":
+    try:
+        test_template_refills_one_figure(Path(tempfile.mkdtemp()), load_scan_pair())
+        test_render_report_rebuilds_template_for_new_config(Path(tempfile.mkdtemp()), load_scan_pair())
+        print("\n✓ Report template tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Report template test failed: {e}")
+        sys.exit(1)
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 """
 Quick test script to verify the dummy data files work correctly.
-This tests the parsing and matching logic without running the full GUI.
+This tests the parsing and matching logic through the engine, without the GUI.
 """
 
 import sys
-from main import GammaAnalysisApp
+import engine
 
 def test_dummy_data():
     """Test the dummy data files."""
@@ -13,14 +13,11 @@ def test_dummy_data():
     print("Testing 1D Batch Scan Compare with Dummy Data")
     print("="*60)
 
-    app = GammaAnalysisApp()
-
     # Test reference file
     print("\n1. Testing Reference File Loading...")
     try:
-        ref_data, ref_header = app._parse_ascii_file("test_data_reference.txt")
-        app.reference_data_full = ref_data
-        app.reference_header = ref_header
+        reference_scans = engine.load_scans("test_data_reference.txt")
+        ref_header = reference_scans.headers
         print(f"   ✓ Reference file loaded: {len(ref_header)} measurements")
         for i, meas in enumerate(ref_header, 1):
             print(f"     - Measurement {i}: {meas[4]} {meas[5]}MV, "
@@ -32,9 +29,8 @@ def test_dummy_data():
     # Test measurement file
     print("\n2. Testing Measurement File Loading...")
     try:
-        mes_data, mes_header = app._parse_ascii_file("test_data_measurement.txt")
-        app.measurement_data_full = mes_data
-        app.measurement_header = mes_header
+        measurement_scans = engine.load_scans("test_data_measurement.txt")
+        mes_header = measurement_scans.headers
         print(f"   ✓ Measurement file loaded: {len(mes_header)} measurements")
         for i, meas in enumerate(mes_header, 1):
             print(f"     - Measurement {i}: {meas[4]} {meas[5]}MV, "
@@ -45,37 +41,23 @@ def test_dummy_data():
 
     # Test data structure
     print("\n3. Testing Data Structures...")
-    import pandas as pd
     try:
-        app.reference_dataframe = pd.DataFrame(
-            ref_data,
-            columns=[
-                'measurement number', 'measurement data', 'measurement time',
-                'measurement type', 'beam type', 'beam energy', 'field size x',
-                'field size y', 'SSD', 'startZ', 'stopZ', 'xpos', 'ypos',
-                'zpos', 'dose'
-            ]
-        )
-        app.measurement_dataframe = pd.DataFrame(
-            mes_data,
-            columns=[
-                'measurement number', 'measurement data', 'measurement time',
-                'measurement type', 'beam type', 'beam energy', 'field size x',
-                'field size y', 'SSD', 'startZ', 'stopZ', 'xpos', 'ypos',
-                'zpos', 'dose'
-            ]
-        )
-        print(f"   ✓ DataFrames created successfully")
-        print(f"     - Reference rows: {len(app.reference_dataframe)}")
-        print(f"     - Measurement rows: {len(app.measurement_dataframe)}")
+        for scans in (reference_scans, measurement_scans):
+            assert scans.points.shape == (scans.offsets[-1], 4)
+            for header in scans.headers:
+                scan_header, points = scans.scan(header.number)
+                assert scan_header is header and len(points) > 0
+        print(f"   ✓ Scan stores created successfully")
+        print(f"     - Reference points: {len(reference_scans.points)}")
+        print(f"     - Measurement points: {len(measurement_scans.points)}")
     except Exception as e:
-        print(f"   ✗ Failed to create DataFrames: {e}")
+        print(f"   ✗ Failed to build scan stores: {e}")
         return False
 
     # Test matching logic
     print("\n4. Testing Measurement Matching...")
     try:
-        matches = app._find_matching_tests()
+        matches = engine.match_scans(measurement_scans, reference_scans)
         print(f"   ✓ Found {len(matches)} matching pairs")
         if len(matches) != 3:
             print(f"   ⚠ Warning: Expected 3 matches, got {len(matches)}")
@@ -90,8 +72,8 @@ def test_dummy_data():
     print("Test Summary:")
     print("="*60)
     print("✓ All tests passed!")
-    print(f"✓ Reference file: 3 measurements with {len(ref_data)} data points")
-    print(f"✓ Measurement file: 3 measurements with {len(mes_data)} data points")
+    print(f"✓ Reference file: 3 measurements with {len(reference_scans.points)} data points")
+    print(f"✓ Measurement file: 3 measurements with {len(measurement_scans.points)} data points")
     print(f"✓ Successfully matched {len(matches)}/3 expected pairs")
     print("\nThe dummy data files are ready for testing!")
     print("\nTo test the full application:")
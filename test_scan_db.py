@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests of the SQLite scan and results database.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import cli
+import engine
+from scan_db import ScanDatabase, measured_date
+
+
+def test_ingested_file_loads_without_parsing(tmp_path, monkeypatch):
+    source = tmp_path / "reference.txt"
+    shutil.copy("test_data_reference.txt", source)
+    parsed = engine.load_scans(source)
+
+    with ScanDatabase(tmp_path / "qa.sqlite") as db:
+        assert db.ingest(source)[1] is True
+        assert db.ingest(source)[1] is False
+        os.utime(source, ns=(1, 1))  # touched, not changed
+        assert db.ingest(source)[1] is False
+
+    monkeypatch.setattr("scan_db.parse_ascii_file", None)  # any parse would fail
+    with ScanDatabase(tmp_path / "qa.sqlite") as db:
+        loaded = db.load(source)
+    assert loaded.headers == parsed.headers
+    assert np.array_equal(loaded.points, parsed.points)
+    assert np.array_equal(loaded.offsets, parsed.offsets)
+
+
+def test_changed_file_is_ingested_again(tmp_path):
+    source = tmp_path / "reference.txt"
+    shutil.copy("test_data_reference.txt", source)
+    with ScanDatabase(tmp_path / "qa.sqlite") as db:
+        db.ingest(source)
+        shutil.copy("test_data_measurement.txt", source)
+        assert db.ingest(source)[1] is True
+        assert [header.date for _, header in db.find_scans()] == ["01-15-2025"] * 3
+
+
+def test_indexed_queries(tmp_path):
+    with ScanDatabase(tmp_path / "qa.sqlite") as db:
+        db.ingest("test_data_reference.txt")
+        db.ingest("test_data_measurement.txt")
+
+        assert len(db.find_scans(scan_type='PRO', energy=6)) == 6
+        assert len(db.find_scans(field_size_x=200)) == 2
+        assert len(db.find_scans(depth=105)) == 6 and db.find_scans(depth=150) == []
+        recent = db.find_scans(since="2025-01-01", until="2025-12-31")
+        assert {os.path.basename(path) for path, _ in recent} == {"test_data_measurement.txt"}
+
+        measurement = engine.load_scans("test_data_measurement.txt")
+        candidates = db.candidates(measurement.headers[0], path="test_data_reference.txt")
+        assert [header.number for _, header in candidates] == [1.0]
+
+    assert measured_date("01-15-2025") == "2025-01-15"
+    assert measured_date("") is None
+
+
+def test_queries_use_an_index(tmp_path):
+    with ScanDatabase(tmp_path / "qa.sqlite") as db:
+        db.ingest("test_data_reference.txt")
+        db.ingest("test_data_measurement.txt")
+        header = engine.load_scans("test_data_measurement.txt").headers[0]
+
+        statements = []
+        db.connection.set_trace_callback(statements.append)
+        db.find_scans(beam_type="PHO", energy=6)
+        db.find_scans(field_size_x=100, depth=100)
+        db.find_scans(depth=100)
+        db.find_scans(since="2025-01-01")
+        db.candidates(header)
+        db.results(beam_type="PHO", energy=6, depth=100)
+        db.connection.set_trace_callback(None)
+
+        used = set()
+        for statement in statements:
+            plan = db.connection.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+            details = [row[-1] for row in plan]
+            assert not any(detail.startswith("SCAN scans") for detail in details), \
+                (statement, details)
+            used.update(index for index in ("scans_by_beam", "scans_by_depth", "scans_by_date")
+                        if any(index in detail for detail in details))
+        assert used == {"scans_by_beam", "scans_by_depth", "scans_by_date"}
+
+
+def test_cli_stores_results(tmp_path):
+    db_path = tmp_path / "qa.sqlite"
+    args = ["--ref", "test_data_reference.txt", "--meas", "test_data_measurement.txt",
+            "--results-only", "--gamma-engine", "numpy", "--db", str(db_path)]
+    assert cli.main(args) == 0
+    assert cli.main(args) == 0  # second run loads both files from the database
+
+    with ScanDatabase(db_path) as db:
+        results = db.results()
+        assert len(results) == 6 and all(r['passed'] for r in results)
+        assert results[0]['gamma_config']['gamma_engine'] == 'numpy'
+        assert results[0]['measured'] == "2025-01-15"
+        assert len(db.results(field_size_x=200)) == 2
+        assert len(db.results(reference_file="test_data_measurement.txt")) == 0
+
+
+if __name__ == "__main__":
+    try:
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_ingested_file_loads_without_parsing(Path(tempfile.mkdtemp()), monkeypatch)
+        test_changed_file_is_ingested_again(Path(tempfile.mkdtemp()))
+        test_indexed_queries(Path(tempfile.mkdtemp()))
+        test_queries_use_an_index(Path(tempfile.mkdtemp()))
+        test_cli_stores_results(Path(tempfile.mkdtemp()))
+        print("\n✓ Scan database tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Scan database test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests of the columnar scan store and its per-measurement index.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from scan_store import DOSE, ScanCatalog, load_scan_set
+
+
+def test_scan_lookup_is_zero_copy():
+    scans = load_scan_set("test_data_reference.txt")
+
+    for i, header in enumerate(scans.headers):
+        scan_header, points = scans.scan(header.number)
+        assert scan_header is header
+        assert np.shares_memory(points, scans.points)
+        assert len(points) == scans.offsets[i + 1] - scans.offsets[i]
+
+    print(f"✓ {len(scans)} scans fetched as views of {len(scans.points)} points")
+
+
+def test_scan_lookup_matches_boolean_mask():
+    scans = load_scan_set("test_data_measurement.txt")
+    numbers = np.repeat([h.number for h in scans.headers], np.diff(scans.offsets))
+
+    for header in scans.headers:
+        _, points = scans.scan(header.number)
+        assert np.array_equal(points[:, DOSE], scans.points[numbers == header.number, DOSE])
+
+
+def test_missing_measurement_raises():
+    scans = load_scan_set("test_data_reference.txt")
+    try:
+        scans.scan(99.0)
+    except KeyError:
+        return
+    raise AssertionError("Expected KeyError for unknown measurement")
+
+
+def test_parsed_file_cache(tmp_path):
+    source = tmp_path / "reference.txt"
+    shutil.copy("test_data_reference.txt", source)
+    cache_dir = tmp_path / "cache"
+
+    parsed = load_scan_set(source, cache_dir)
+    cached = load_scan_set(source, cache_dir)
+    assert isinstance(cached.points, np.memmap)  # loaded, not reparsed
+    assert cached.headers == parsed.headers
+    assert np.array_equal(cached.points, parsed.points)
+    assert np.array_equal(cached.offsets, parsed.offsets)
+
+    # Touched but unchanged: the hash still matches
+    os.utime(source, (1, 1))
+    assert isinstance(load_scan_set(source, cache_dir).points, np.memmap)
+
+    # Changed content is reparsed
+    source.write_text(source.read_text().replace("%SSD\t1000.000", "%SSD\t900.000", 1))
+    changed = load_scan_set(source, cache_dir)
+    assert not isinstance(changed.points, np.memmap)
+    assert changed.headers[0].ssd == 900.0
+    print("✓ Parsed-file cache reused and invalidated as expected")
+
+
+def test_catalog_reads_only_requested_scans(tmp_path):
+    import engine
+
+    catalog = ScanCatalog("test_data_reference.txt")
+    scans = load_scan_set("test_data_reference.txt")
+    assert catalog.headers == scans.headers
+    assert catalog.loaded == 0
+
+    # A measurement file holding only the first scan matches one reference
+    content = open("test_data_measurement.txt").read()
+    first_block = content.split("# Measurement number")[1]
+    measurement_file = tmp_path / "one_scan.txt"
+    measurement_file.write_text("# Measurement number" + first_block + ":EOF\n")
+
+    measurement = engine.open_scans(measurement_file)
+    matches = engine.match_scans(measurement, catalog)
+    engine.compute_gamma(measurement, catalog, *matches[0])
+    assert len(matches) == 1
+    assert catalog.loaded == 1
+
+    number = matches[0][1]
+    assert np.array_equal(catalog.scan(number)[1], scans.scan(number)[1])
+    print(f"✓ Catalog of {len(catalog)} scans read {catalog.loaded}")
+
+
+def test_open_reads_but_never_fills_the_cache(tmp_path):
+    import engine
+
+    source = tmp_path / "reference.txt"
+    shutil.copy("test_data_reference.txt", source)
+    cache_dir = tmp_path / "cache"
+
+    first = engine.open_scans(source, cache_dir=cache_dir)
+    assert isinstance(first, ScanCatalog) and not cache_dir.exists()
+
+    engine.fill_scan_cache(source, cache_dir)
+    second = engine.open_scans(source, cache_dir=cache_dir)
+    assert isinstance(second.points, np.memmap)
+    assert second.headers == first.headers
+    print("✓ Opening reads the cached copy that fill_scan_cache saves")
+
+
+def test_catalog_detects_changed_file(tmp_path):
+    source = tmp_path / "reference.txt"
+    shutil.copy("test_data_reference.txt", source)
+    catalog = ScanCatalog(source)
+
+    source.write_text(source.read_text() + "\n")
+    try:
+        catalog.scan(catalog.headers[0].number)
+    except Exception as e:
+        assert "changed" in str(e)
+        return
+    raise AssertionError("Expected an error for a changed file")
+
+
+if __name__ == "__main__":
+    try:
+        test_scan_lookup_is_zero_copy()
+        test_scan_lookup_matches_boolean_mask()
+        test_missing_measurement_raises()
+        test_parsed_file_cache(Path(tempfile.mkdtemp()))
+        test_catalog_reads_only_requested_scans(Path(tempfile.mkdtemp()))
+        test_open_reads_but_never_fills_the_cache(Path(tempfile.mkdtemp()))
+        test_catalog_detects_changed_file(Path(tempfile.mkdtemp()))
+        print("\n✓ Scan store tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Scan store test failed: {e}")
+        sys.exit(1)
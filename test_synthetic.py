@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests of the synthetic scan-library generator and the benchmark suite.
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import engine
+from benchmarks import bench_suite, synthetic
+from profiles import CROSSLINE, INLINE
+from scan_store import load_scan_set
+
+
+def test_libraries_match_one_to_one(tmp_path):
+    reference_path, measurement_path = tmp_path / "ref.txt", tmp_path / "meas.txt"
+    points = synthetic.write_library(reference_path, 120, seed=3)
+    synthetic.write_library(measurement_path, 120, seed=3, variation=0.003,
+                            date="01-15-2025")
+
+    reference = load_scan_set(reference_path)
+    measurement = load_scan_set(measurement_path)
+    assert len(reference) == 120 and len(reference.points) == points
+    assert {h.scan_type for h in reference.headers} == {'PRO', 'DPT'}
+    assert len(set(np.diff(reference.offsets))) > 10  # varied resolutions and extents
+
+    matches = engine.match_scans(measurement, reference)
+    assert [tuple(match) for match in matches] == [(h.number, h.number)
+                                                   for h in measurement.headers]
+
+    profiles = [i for i, h in enumerate(reference.headers) if h.scan_type == 'PRO']
+    directions = {reference.profiles.directions[i] for i in profiles}
+    assert directions == {INLINE, CROSSLINE}
+    assert np.allclose(reference.profiles.factors['cax'][profiles], 1.0, atol=1e-3)
+
+
+def test_too_many_scans_raises():
+    try:
+        synthetic.scan_plan(10 ** 6)
+    except Exception as e:
+        assert "distinct" in str(e)
+        return
+    raise AssertionError("Expected an error beyond the distinct combinations")
+
+
+def test_suite_records_and_checks(tmp_path):
+    results = tmp_path / "results.jsonl"
+    args = ["--scans", "40", "--gamma-pairs", "10", "--pages", "1", "--repeat", "1",
+            "--results", str(results), "--check"]
+    assert bench_suite.main(args) == 0
+
+    # A previous run far faster than anything possible is a regression
+    record = json.loads(results.read_text())
+    record['metrics'] = {name: value * 1000 for name, value in record['metrics'].items()}
+    results.write_text(json.dumps(record) + "\n")
+    assert bench_suite.main(args) == 1
+    assert len(results.read_text().splitlines()) == 2
+
+
+if __name__ == "__main__":
+    try:
+        test_libraries_match_one_to_one(Path(tempfile.mkdtemp()))
+        test_too_many_scans_raises()
+        test_suite_records_and_checks(Path(tempfile.mkdtemp()))
+        print("\n✓ Synthetic data tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Synthetic data test failed: {e}")
+        sys.exit(1)
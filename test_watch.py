@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests of the watch-folder daemon.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader
+
+import engine
+import watch
+
+
+def test_files_are_ready_once_settled(tmp_path):
+    watcher = watch.FolderWatcher(tmp_path)
+    (tmp_path / "empty.txt").write_text("")
+    (tmp_path / "notes.pdf").write_text("not an export")
+    export = tmp_path / "export.txt"
+    export.write_text("# Measurement")
+
+    assert watcher.poll() == []  # seen, not yet known to be complete
+    export.write_text("# Measurement number 1")
+    assert watcher.poll() == []  # still growing
+    assert watcher.poll() == ["export.txt"]
+
+    watcher.mark_processed("export.txt")
+    assert watcher.poll() == []
+    os.utime(export, ns=(1, 1))  # re-exported
+    watcher.poll()
+    assert watcher.poll() == ["export.txt"]
+
+
+def test_session_appends_each_new_file(tmp_path):
+    inbox, out = tmp_path / "inbox", tmp_path / "out"
+    inbox.mkdir()
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    session = watch.WatchSession(["test_data_reference.txt"], str(inbox), str(out), config)
+
+    shutil.copy("test_data_measurement.txt", inbox / "morning.txt")
+    assert session.poll_once(settle=False) == ["morning.txt"]
+    rolling_report, = out.glob("rolling_report_*.pdf")
+    assert len(PdfReader(rolling_report).pages) == 3
+
+    shutil.copy("test_data_measurement.txt", inbox / "afternoon.txt")
+    (inbox / "broken.txt").write_text("not an IBA export")
+    assert session.poll_once(settle=False) == ["afternoon.txt", "broken.txt"]
+    assert len(PdfReader(rolling_report).pages) == 6
+    assert session.poll_once(settle=False) == []
+
+    records = [json.loads(line) for line in open(out / watch.RESULTS_LOG)]
+    assert [r['file'] for r in records] == (["morning.txt"] * 3 + ["afternoon.txt"] * 3 +
+                                            ["broken.txt"])
+    assert all(r['passed'] for r in records[:6])
+    assert records[6]['error'] is not None
+
+    # A restarted daemon skips what was already processed
+    restarted = watch.WatchSession(["test_data_reference.txt"], str(inbox), str(out), config)
+    assert restarted.poll_once(settle=False) == []
+
+
+def test_once_option(tmp_path):
+    inbox, out = tmp_path / "inbox", tmp_path / "out"
+    inbox.mkdir()
+    shutil.copy("test_data_measurement.txt", inbox / "qa.txt")
+
+    exit_code = watch.main(["--ref", "test_data_reference.txt", "--watch", str(inbox),
+                            "--out", str(out), "--once", "--gamma-engine", "numpy",
+                            "--render", "none"])
+    assert exit_code == 0
+    assert len(open(out / watch.RESULTS_LOG).readlines()) == 3
+    assert list(out.glob("rolling_report_*.pdf")) == []
+
+
+def test_vanished_file_is_skipped(tmp_path, monkeypatch):
+    inbox, out = tmp_path / "inbox", tmp_path / "out"
+    inbox.mkdir()
+    config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine='numpy')
+    session = watch.WatchSession(["test_data_reference.txt"], str(inbox), str(out), config)
+
+    # Removed between listing the folder and reading its size
+    shutil.copy("test_data_measurement.txt", inbox / "moved.txt")
+    entries = list(os.scandir(inbox))
+    os.remove(inbox / "moved.txt")
+    monkeypatch.setattr(os, "scandir", lambda folder: entries)
+    assert session.poll_once(settle=False) == []
+    monkeypatch.undo()
+
+    # Removed after the poll found it ready
+    shutil.copy("test_data_measurement.txt", inbox / "moved.txt")
+    assert session.watcher.poll(settle=False) == ["moved.txt"]
+    os.remove(inbox / "moved.txt")
+    assert session.process("moved.txt") == []
+    record = json.loads(open(out / watch.RESULTS_LOG).readlines()[-1])
+    assert record['file'] == "moved.txt" and record['error'] is not None
+
+
+if __name__ == "__main__":
+    try:
+        test_files_are_ready_once_settled(Path(tempfile.mkdtemp()))
+        test_session_appends_each_new_file(Path(tempfile.mkdtemp()))
+        test_once_option(Path(tempfile.mkdtemp()))
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_vanished_file_is_skipped(Path(tempfile.mkdtemp()), monkeypatch)
+        print("\n✓ Watch folder tests passed")
+        sys.exit(0)
+    except AssertionError as e:
+        print(f"\n✗ Watch folder test failed: {e}")
+        sys.exit(1)
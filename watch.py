@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Watch-folder daemon: analyse measurement exports as they arrive.
+
+Usage:
+    python watch.py --ref baseline.txt --watch /shared/exports --out /shared/qa
+    python watch.py --ref baselines/ --watch exports/ --out qa/ --once
+
+The reference library is parsed once and kept in memory. The watched folder
+is polled every --interval seconds; a new or re-exported ASCII file is
+processed once its size and modification time have stopped changing (so a
+file still being written is not read half-way). Only that file is parsed,
+matched and evaluated; its results are appended to the results log and its
+report pages to the rolling report of the day.
+
+Layout of --out:
+
+    rolling_report_<YYYY-MM-DD>.pdf
+                           pages of every file processed that day, in arrival order
+    results.jsonl          one record per matched pair, or one with the error for
+                           a file that failed or has no matches
+    reports/<name>_gamma.pdf
+    watch_state.json       files already processed, so a restart skips them
+
+With several reference files, each measurement file is compared against the
+reference file of the same name, as in cli.py.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')  # Non-interactive backend
+
+import engine
+from cli import ASCII_EXTENSIONS, expand_paths
+from profiles import NORMALIZATION_MODES
+
+ROLLING_REPORT = 'rolling_report_{day}.pdf'  # one per day, so appending stays cheap
+RESULTS_LOG = 'results.jsonl'
+STATE_FILE = 'watch_state.json'
+REPORTS_DIR = 'reports'
+
+DEFAULT_INTERVAL = 5.0
+
+
+class FolderWatcher:
+    """Polls a folder for new or changed ASCII files.
+
+    ``processed`` maps file names to the (size, mtime_ns) they had when they
+    were handled; a file is ready when it is not in ``processed`` with the
+    same stamp and its stamp did not change since the previous poll.
+    """
+
+    def __init__(self, folder, processed=None):
+        self.folder = folder
+        self.processed = dict(processed or {})
+        self._pending = {}  # name -> stamp seen at the last poll
+
+    def _stamps(self):
+        stamps = {}
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.lower().endswith(ASCII_EXTENSIONS):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Removed or renamed since the folder was listed
+                stamps[entry.name] = [stat.st_size, stat.st_mtime_ns]
+        return stamps
+
+    def poll(self, settle=True):
+        """Names of the files ready to process, oldest first.
+
+        With ``settle`` False, files are ready as soon as they are seen.
+        """
+        ready = []
+        stamps = self._stamps()
+        for name, stamp in stamps.items():
+            if self.processed.get(name) == stamp or stamp[0] == 0:
+                continue
+            if not settle or self._pending.get(name) == stamp:
+                ready.append(name)
+        self._pending = stamps
+        return sorted(ready, key=lambda name: (stamps[name][1], name))
+
+    def mark_processed(self, name):
+        stat = os.stat(os.path.join(self.folder, name))
+        self.processed[name] = [stat.st_size, stat.st_mtime_ns]
+
+
+def append_pdf(report_path, pdf_path):
+    """Append the pages of ``pdf_path`` to ``report_path`` (created if missing)."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    if os.path.exists(report_path):
+        writer.append(report_path)
+    writer.append(pdf_path)
+    # Each appended report embeds its own fonts (pypdf >= 4.3 dedupes them)
+    if hasattr(writer, 'compress_identical_objects'):
+        writer.compress_identical_objects()
+
+    tmp_path = f"{report_path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        writer.write(file)
+    os.replace(tmp_path, report_path)
+
+
+class WatchSession:
+    """Resident reference library plus the outputs of one watched folder."""
+
+    def __init__(self, reference_paths, watch_dir, out_dir, gamma_config=None,
+                 render='all', threshold=engine.PASS_THRESHOLD, workers=1):
+        self.watch_dir = watch_dir
+        self.out_dir = out_dir
+        self.gamma_config = gamma_config
+        self.render = render
+        self.threshold = threshold
+        self.workers = workers
+        os.makedirs(os.path.join(out_dir, REPORTS_DIR), exist_ok=True)
+
+        self.references = {}
+        for path in reference_paths:
+            print(f"\nLoading reference file: {path}")
+            self.references[os.path.basename(path)] = engine.load_scans(path)
+
+        processed = {}
+        state_path = os.path.join(out_dir, STATE_FILE)
+        if os.path.exists(state_path):
+            with open(state_path) as file:
+                processed = json.load(file).get('processed', {})
+        self.watcher = FolderWatcher(watch_dir, processed)
+
+    def reference_for(self, name):
+        if len(self.references) == 1:
+            return next(iter(self.references.values()))
+        if name not in self.references:
+            raise Exception(f"No reference file named {name}")
+        return self.references[name]
+
+    def _log(self, records):
+        with open(os.path.join(self.out_dir, RESULTS_LOG), 'a') as file:
+            for record in records:
+                file.write(json.dumps(record) + '\n')
+
+    def _save_state(self):
+        state_path = os.path.join(self.out_dir, STATE_FILE)
+        with open(state_path + '.tmp', 'w') as file:
+            json.dump({'processed': self.watcher.processed}, file, indent=1)
+        os.replace(state_path + '.tmp', state_path)
+
+    def process(self, name):
+        """Parse, match and evaluate one measurement file; returns its results."""
+        path = os.path.join(self.watch_dir, name)
+        stem = os.path.splitext(name)[0]
+        pdf_path = os.path.join(self.out_dir, REPORTS_DIR, f"{stem}_gamma.pdf")
+        received = time.strftime('%Y-%m-%dT%H:%M:%S')
+        print(f"\n{'='*60}\n{received}  {name}\n{'='*60}")
+
+        try:
+            self.watcher.mark_processed(name)  # before parsing: a bad file is not retried
+            reference = self.reference_for(name)
+            measurement = engine.load_scans(path)
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)  # a re-export replaces the previous report
+            results = engine.run_batch(reference, measurement, pdf_path, self.gamma_config,
+                                       workers=self.workers, render=self.render,
+                                       threshold=self.threshold)
+        except Exception as e:
+            print(f"  ✗ {name}: {str(e)}")
+            self._log([{'time': received, 'file': name, 'error': str(e)}])
+            self._save_state()
+            return []
+
+        if not results:
+            print(f"  ⚠ {name}: no matching measurement pairs")
+            self._log([{'time': received, 'file': name,
+                        'error': "no matching measurement pairs"}])
+            self._save_state()
+            return results
+
+        print(engine.format_results_table(results, self.threshold))
+        self._log([{
+            'time': received, 'file': name,
+            'measurement': measure_num, 'reference': ref_num,
+            'pass_ratio': None if pass_ratio is None else float(pass_ratio),
+            'passed': bool(error is None and pass_ratio >= self.threshold),
+            'error': error,
+        } for measure_num, ref_num, pass_ratio, error in results])
+
+        if os.path.exists(pdf_path):
+            rolling_report = ROLLING_REPORT.format(day=received[:10])
+            append_pdf(os.path.join(self.out_dir, rolling_report), pdf_path)
+        self._save_state()
+        return results
+
+    def poll_once(self, settle=True):
+        """Process every file that is ready; returns the names processed."""
+        names = self.watcher.poll(settle)
+        for name in names:
+            self.process(name)
+        return names
+
+    def run(self, interval=DEFAULT_INTERVAL):
+        """Poll until interrupted (Ctrl+C)."""
+        print(f"\nWatching {self.watch_dir} every {interval:g} s (Ctrl+C to stop)")
+        try:
+            while True:
+                self.poll_once()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Analyse IBA ASCII exports as they arrive in a folder."
+    )
+    parser.add_argument('--ref', required=True,
+                        help="Reference file, directory or glob pattern")
+    parser.add_argument('--watch', required=True, help="Folder receiving measurement exports")
+    parser.add_argument('--out', required=True,
+                        help="Directory for the daily rolling reports and results log")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help="Seconds between polls (default: %(default)s)")
+    parser.add_argument('--once', action='store_true',
+                        help="Process the files present now, then exit")
+    parser.add_argument('--pass-threshold', type=float,
+                        default=engine.PASS_THRESHOLD * 100,
+                        help="Minimum pass rate in percent (default: %(default)s)")
+    parser.add_argument('--gamma-engine', choices=engine.GAMMA_ENGINES,
+                        default=engine.DEFAULT_GAMMA_CONFIG['gamma_engine'],
+                        help="Gamma implementation (default: %(default)s)")
+    parser.add_argument('--normalization', choices=NORMALIZATION_MODES,
+                        default=engine.DEFAULT_GAMMA_CONFIG['normalization'],
+                        help="Dose every profile is normalised to (default: %(default)s)")
+    parser.add_argument('--render', choices=engine.RENDER_MODES, default='all',
+                        help="Report pages to render (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes per file; 0 uses every CPU "
+                             "(default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    reference_paths = expand_paths(args.ref)
+    if not reference_paths:
+        parser.error(f"no reference files found for {args.ref}")
+    if not os.path.isdir(args.watch):
+        parser.error(f"not a directory: {args.watch}")
+
+    gamma_config = dict(engine.DEFAULT_GAMMA_CONFIG, gamma_engine=args.gamma_engine,
+                        normalization=args.normalization)
+    session = WatchSession(reference_paths, args.watch, args.out, gamma_config,
+                           render=args.render, threshold=args.pass_threshold / 100,
+                           workers=args.workers or os.cpu_count() or 1)
+    if args.once:
+        names = session.poll_once(settle=False)
+        print(f"\n✓ Processed {len(names)} file(s)")
+    else:
+        session.run(args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())